@@ -0,0 +1,165 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from auth import revoke_tokens, ACCESS_TOKEN_EXPIRE_MINUTES, ACCOUNT_DELETED
+from database import SessionLocal
+from models import Akun, AkunDihapus, Mahasiswa, Kantin
+
+logger = logging.getLogger(__name__)
+
+akun_table = Akun.__table__
+deleted_table = AkunDihapus.__table__
+
+# How often each worker reloads token revocations made by other workers
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+
+# user_type -> (model, primary key attribute)
+USER_MODELS = {
+    "mahasiswa": (Mahasiswa, "id_mahasiswa"),
+    "kantin": (Kantin, "id_kantin"),
+}
+
+def email_registered(db: Session, email: str) -> bool:
+    """Check whether any mahasiswa or kantin already uses this email"""
+    return db.query(Akun.email).filter(Akun.email == email).first() is not None
+
+def commit_user(db: Session):
+    """Commit a new or changed user, answering 400 when a concurrent request took its email first"""
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+def revoke_user_tokens(db: Session, user_type: str, user_id: int):
+    """Invalidate every token issued to a user so far; the caller commits"""
+    user = (Akun.user_type == user_type, Akun.user_id == user_id)
+    db.query(Akun).filter(*user).update(
+        {Akun.token_version: Akun.token_version + 1, Akun.token_revoked_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    version = db.query(Akun.token_version).filter(*user).scalar()
+    if version is not None:
+        revoke_tokens(user_type, user_id, version)
+
+def sync_revocations():
+    """Load revocations and account deletions from the last token lifetime, so other workers and restarts see them"""
+    since = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    db = SessionLocal()
+    try:
+        rows = db.query(Akun.user_type, Akun.user_id, Akun.token_version).filter(
+            Akun.token_revoked_at >= since
+        ).all()
+        deleted = db.query(AkunDihapus.user_type, AkunDihapus.user_id).filter(AkunDihapus.dihapus >= since).all()
+        # Older deletions only cover tokens that have expired by now
+        db.query(AkunDihapus).filter(AkunDihapus.dihapus < since).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    for row in rows:
+        revoke_tokens(row.user_type, row.user_id, row.token_version)
+    for row in deleted:
+        revoke_tokens(row.user_type, row.user_id, ACCOUNT_DELETED)
+
+def _listen(user_type: str, model, id_attr: str):
+    def after_insert(mapper, connection, target):
+        connection.execute(akun_table.insert().values(
+            email=target.email, user_type=user_type, user_id=getattr(target, id_attr), password=target.password
+        ))
+
+    def after_update(mapper, connection, target):
+        state = inspect(target)
+        if not (state.attrs.email.history.has_changes() or state.attrs.password.history.has_changes()):
+            return
+        result = connection.execute(akun_table.update().where(
+            akun_table.c.user_type == user_type, akun_table.c.user_id == getattr(target, id_attr)
+        ).values(email=target.email, password=target.password))
+        if result.rowcount == 0:
+            after_insert(mapper, connection, target)
+
+    def after_delete(mapper, connection, target):
+        user_id = getattr(target, id_attr)
+        connection.execute(akun_table.delete().where(
+            akun_table.c.user_type == user_type, akun_table.c.user_id == user_id
+        ))
+        # The index row is gone, so the deletion is recorded separately for sync_revocations
+        connection.execute(deleted_table.delete().where(
+            deleted_table.c.user_type == user_type, deleted_table.c.user_id == user_id
+        ))
+        connection.execute(deleted_table.insert().values(user_type=user_type, user_id=user_id, dihapus=datetime.utcnow()))
+
+    event.listen(model, "after_insert", after_insert)
+    event.listen(model, "after_update", after_update)
+    event.listen(model, "after_delete", after_delete)
+
+for _user_type, (_model, _id_attr) in USER_MODELS.items():
+    _listen(_user_type, _model, _id_attr)
+
+def _index_users(db: Session, versions: dict) -> int:
+    """Add akun rows for users that have none and return how many were added.
+
+    An email belongs to one account. When a mahasiswa and a kantin share one,
+    the mahasiswa is indexed (matching the order login used to check the tables
+    in) and the kantin is logged, since it cannot log in until one of them
+    changes email.
+    """
+    added = 0
+    for user_type, (model, id_attr) in USER_MODELS.items():
+        user_id = getattr(model, id_attr)
+        missing = db.query(model.email, user_id.label("user_id"), model.password).outerjoin(
+            Akun, (Akun.user_type == user_type) & (Akun.user_id == user_id)
+        ).filter(Akun.user_id.is_(None)).all()
+        emails = [user.email for user in missing]
+        taken = set()
+        for start in range(0, len(emails), 1000):
+            taken.update(email for email, in db.query(Akun.email).filter(Akun.email.in_(emails[start:start + 1000])))
+        rows = []
+        for user in missing:
+            if user.email in taken:
+                logger.warning("%s %s is not indexed: its email %s belongs to another account", user_type, user.user_id, user.email)
+                continue
+            rows.append({
+                "email": user.email, "user_type": user_type, "user_id": user.user_id, "password": user.password,
+                **versions.get((user_type, user.user_id), {"token_version": 0}),
+            })
+        db.bulk_insert_mappings(Akun, rows)
+        added += len(rows)
+    return added
+
+def backfill_accounts(db: Session) -> int:
+    """Index users missing from akun, e.g. created before it existed; cheap once everyone is indexed"""
+    try:
+        added = _index_users(db, {})
+        db.commit()
+    except IntegrityError:
+        # Another worker starting at the same time indexed them first
+        db.rollback()
+        return 0
+    return added
+
+def rebuild_accounts(db: Session) -> int:
+    """Rebuild the akun index from both user tables; token versions survive the rebuild"""
+    versions = {
+        (row.user_type, row.user_id): {"token_version": row.token_version, "token_revoked_at": row.token_revoked_at}
+        for row in db.query(Akun.user_type, Akun.user_id, Akun.token_version, Akun.token_revoked_at)
+    }
+    db.query(Akun).delete(synchronize_session=False)
+    indexed = _index_users(db, versions)
+    db.commit()
+    return indexed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the unified akun login index")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Indexed {rebuild_accounts(db)} accounts")
+    finally:
+        db.close()
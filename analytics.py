@@ -0,0 +1,167 @@
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal, insert_for
+from models import Pesanan, DetailPesanan, Menu, StatusPesananEnum, RekapPenjualan, RekapMenu
+
+def is_selesai(status) -> bool:
+    """Check a status given either as the model enum or the schema string enum"""
+    return getattr(status, "value", status) == StatusPesananEnum.selesai.value
+
+def _hour(tanggal: datetime) -> datetime:
+    return tanggal.replace(minute=0, second=0, microsecond=0)
+
+def _increment(db: Session, model, keys: dict, values: dict):
+    """Add values onto a rollup row, creating it if needed, in a single upsert"""
+    insert = insert_for(db)
+    stmt = insert(model).values(**keys, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + stmt.excluded[name] for name in values},
+    )
+    db.execute(stmt)
+
+def apply_pesanan(db: Session, pesanan: Pesanan, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a completed pesanan's contribution to the rollups"""
+    lines = db.query(DetailPesanan.id_menu, DetailPesanan.jumlah, DetailPesanan.harga_total).filter(
+        DetailPesanan.id_pesanan == pesanan.id_pesanan
+    ).all()
+
+    per_menu = defaultdict(lambda: [0, Decimal("0")])
+    for line in lines:
+        per_menu[line.id_menu][0] += line.jumlah
+        per_menu[line.id_menu][1] += line.harga_total
+
+    _increment(db, RekapPenjualan, {"id_kantin": pesanan.id_kantin, "jam": _hour(pesanan.tanggal)}, {
+        "jumlah_pesanan": sign,
+        "jumlah_item": sign * sum(jumlah for jumlah, _ in per_menu.values()),
+        "total_pendapatan": sign * sum((harga for _, harga in per_menu.values()), Decimal("0")),
+    })
+    for id_menu, (jumlah, harga) in per_menu.items():
+        _increment(db, RekapMenu, {"id_kantin": pesanan.id_kantin, "id_menu": id_menu, "tanggal": pesanan.tanggal.date()}, {
+            "jumlah": sign * jumlah,
+            "total_pendapatan": sign * harga,
+        })
+
+def record_status_change(db: Session, pesanan: Pesanan, previous_status):
+    """Update rollups when a pesanan moves into or out of "selesai\""""
+    if is_selesai(pesanan.status) and not is_selesai(previous_status):
+        apply_pesanan(db, pesanan, 1)
+    elif is_selesai(previous_status) and not is_selesai(pesanan.status):
+        apply_pesanan(db, pesanan, -1)
+
+@contextmanager
+def rollup_update(db: Session, pesanan: Pesanan):
+    """Keep rollups correct while the lines of an already completed pesanan change"""
+    completed = is_selesai(pesanan.status)
+    if completed:
+        apply_pesanan(db, pesanan, -1)
+    yield
+    if completed:
+        db.flush()
+        apply_pesanan(db, pesanan, 1)
+
+def rebuild_rollups(db: Session, kantin_id: Optional[int] = None, batch_size: int = 1000):
+    """Recompute rollups from scratch for one kantin or all of them"""
+    for model in (RekapPenjualan, RekapMenu):
+        query = db.query(model)
+        if kantin_id is not None:
+            query = query.filter(model.id_kantin == kantin_id)
+        query.delete(synchronize_session=False)
+
+    query = db.query(
+        Pesanan.id_pesanan, Pesanan.id_kantin, Pesanan.tanggal,
+        DetailPesanan.id_menu, DetailPesanan.jumlah, DetailPesanan.harga_total,
+    ).outerjoin(DetailPesanan, DetailPesanan.id_pesanan == Pesanan.id_pesanan).filter(
+        Pesanan.status == StatusPesananEnum.selesai
+    )
+    if kantin_id is not None:
+        query = query.filter(Pesanan.id_kantin == kantin_id)
+
+    # Aggregates are keyed by bucket, so memory grows with the number of hours and menus, not orders
+    hours = defaultdict(lambda: {"pesanan": set(), "jumlah_item": 0, "total_pendapatan": Decimal("0")})
+    menus = defaultdict(lambda: {"jumlah": 0, "total_pendapatan": Decimal("0")})
+    for row in query.yield_per(batch_size):
+        hour = hours[(row.id_kantin, _hour(row.tanggal))]
+        hour["pesanan"].add(row.id_pesanan)
+        if row.id_menu is None:
+            continue
+        hour["jumlah_item"] += row.jumlah
+        hour["total_pendapatan"] += row.harga_total
+        menu = menus[(row.id_kantin, row.id_menu, row.tanggal.date())]
+        menu["jumlah"] += row.jumlah
+        menu["total_pendapatan"] += row.harga_total
+
+    db.bulk_insert_mappings(RekapPenjualan, [
+        {"id_kantin": id_kantin, "jam": jam, "jumlah_pesanan": len(values["pesanan"]),
+         "jumlah_item": values["jumlah_item"], "total_pendapatan": values["total_pendapatan"]}
+        for (id_kantin, jam), values in hours.items()
+    ])
+    db.bulk_insert_mappings(RekapMenu, [
+        {"id_kantin": id_kantin, "id_menu": id_menu, "tanggal": tanggal, **values}
+        for (id_kantin, id_menu, tanggal), values in menus.items()
+    ])
+    db.commit()
+    return len(hours), len(menus)
+
+def get_kantin_analytics(db: Session, kantin_id: int, date_from: date, date_to: date, top: int = 5) -> dict:
+    """Read sales figures for [date_from, date_to) from the rollup tables"""
+    hours = db.query(
+        RekapPenjualan.jam, RekapPenjualan.jumlah_pesanan, RekapPenjualan.jumlah_item, RekapPenjualan.total_pendapatan
+    ).filter(
+        RekapPenjualan.id_kantin == kantin_id,
+        RekapPenjualan.jam >= datetime.combine(date_from, datetime.min.time()),
+        RekapPenjualan.jam < datetime.combine(date_to, datetime.min.time()),
+    ).all()
+
+    def bucket():
+        return {"jumlah_pesanan": 0, "jumlah_item": 0, "total_pendapatan": Decimal("0")}
+
+    per_hari = defaultdict(bucket)
+    per_jam = defaultdict(bucket)
+    total = bucket()
+    for row in hours:
+        for target in (per_hari[row.jam.date()], per_jam[row.jam.hour], total):
+            target["jumlah_pesanan"] += row.jumlah_pesanan
+            target["jumlah_item"] += row.jumlah_item
+            target["total_pendapatan"] += row.total_pendapatan
+
+    menu_terlaris = db.query(
+        RekapMenu.id_menu, Menu.nama_menu,
+        func.sum(RekapMenu.jumlah).label("jumlah"),
+        func.sum(RekapMenu.total_pendapatan).label("total_pendapatan"),
+    ).join(Menu, Menu.id_menu == RekapMenu.id_menu).filter(
+        RekapMenu.id_kantin == kantin_id,
+        RekapMenu.tanggal >= date_from,
+        RekapMenu.tanggal < date_to,
+    ).group_by(RekapMenu.id_menu, Menu.nama_menu).order_by(func.sum(RekapMenu.jumlah).desc()).limit(top).all()
+
+    rata_rata = total["total_pendapatan"] / total["jumlah_pesanan"] if total["jumlah_pesanan"] else Decimal("0")
+    return {
+        "id_kantin": kantin_id,
+        "dari": date_from,
+        "sampai": date_to,
+        **total,
+        "rata_rata_keranjang": rata_rata.quantize(Decimal("0.01")),
+        "per_hari": [{"tanggal": day, **values} for day, values in sorted(per_hari.items())],
+        "per_jam": [{"jam": hour, **values} for hour, values in sorted(per_jam.items())],
+        "menu_terlaris": [row._asdict() for row in menu_terlaris],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild sales rollups from completed pesanan")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--kantin", type=int, default=None, help="only rebuild this kantin")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        hour_rows, menu_rows = rebuild_rollups(db, kantin_id=args.kantin)
+        print(f"Rebuilt {hour_rows} hourly and {menu_rows} menu rollup rows")
+    finally:
+        db.close()
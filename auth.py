@@ -1,28 +1,66 @@
 
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Union
-from fastapi import Depends, HTTPException, status
+from typing import Optional, Tuple, Union
+from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from models import Mahasiswa, Kantin
 from database import get_db
+from password_policy import build_context
+import hashlib
+import hmac
 import os
+import threading
+import time
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# "jose" (python-jose) or "pyjwt", a faster implementation that needs the optional PyJWT package
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+# Recently verified tokens whose claims are reused until they expire; 0 disables the cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Minimum accepted token version per user, for users whose tokens were revoked.
+# Kept per process and bounded; access tokens expire quickly anyway.
+REVOCATION_MAP_SIZE = int(os.getenv("REVOCATION_MAP_SIZE", "10000"))
+ACCOUNT_DELETED = 2 ** 31
+_revoked_versions = OrderedDict()
+
+# Operational endpoints are disabled unless an admin token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def load_jwt_backend(name: str):
+    """Return the (encode, decode, error type) functions of a JWT implementation"""
+    if name == "pyjwt":
+        import jwt as pyjwt
+        return pyjwt.encode, pyjwt.decode, pyjwt.PyJWTError
+    if name != "jose":
+        raise ValueError(f"Unsupported JWT_BACKEND: {name}")
+    return jwt.encode, jwt.decode, JWTError
+
+jwt_encode, jwt_decode, JWTDecodeError = load_jwt_backend(JWT_BACKEND)
+
+# token digest -> (exp timestamp, claims), least recently used first
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+# Password hashing, configured by the policy in password_policy.py
+pwd_context = build_context()
 security = HTTPBearer()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash if the stored one no longer matches the policy"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
@@ -36,30 +74,68 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt_encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_token(user_type: str, user_id: int, is_profile_complete: bool, token_version: int, expires_delta: Optional[timedelta] = None):
+    """Create an access token carrying the claims read routes need without a DB lookup"""
+    return create_access_token(
+        data={
+            "sub": str(user_id),
+            "user_type": user_type,
+            "pc": bool(is_profile_complete),
+            "tv": token_version,
+        },
+        expires_delta=expires_delta
+    )
+
+def revoke_tokens(user_type: str, user_id: int, min_version: int):
+    """Reject tokens of a user whose token version is below min_version"""
+    key = (user_type, user_id)
+    _revoked_versions[key] = max(min_version, _revoked_versions.pop(key, 0))
+    while len(_revoked_versions) > REVOCATION_MAP_SIZE:
+        _revoked_versions.popitem(last=False)
+
 def verify_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+    """Verify JWT token and return payload.
+
+    Clients send the same bearer token on every request, so verified claims are
+    cached by token digest until the token's exp. Revocation is checked on the
+    claims afterwards and is not affected by the cache.
+    """
+    digest = hashlib.sha256(token.encode()).digest() if TOKEN_CACHE_SIZE else None
+    if digest is not None:
+        with _token_cache_lock:
+            cached = _token_cache.get(digest)
+            if cached is not None:
+                if cached[0] > time.time():
+                    _token_cache.move_to_end(digest)
+                    return cached[1]
+                del _token_cache[digest]
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        payload = jwt_decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTDecodeError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> Union[Mahasiswa, Kantin]:
-    """Get current authenticated user"""
-    payload = verify_token(credentials.credentials)
-    
-    user_id: int = payload.get("sub")
-    user_type: str = payload.get("user_type")
+    if digest is not None and "exp" in payload:
+        with _token_cache_lock:
+            _token_cache[digest] = (payload["exp"], payload)
+            while len(_token_cache) > TOKEN_CACHE_SIZE:
+                _token_cache.popitem(last=False)
+    return payload
+
+def read_claims(payload: dict) -> Tuple[str, int, int]:
+    """Extract user type, id and token version from a payload, rejecting revoked tokens"""
+    user_type = payload.get("user_type")
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        user_id = None
     
     if user_id is None or user_type is None:
         raise HTTPException(
@@ -67,6 +143,58 @@ def get_current_user(
             detail="Could not validate credentials",
         )
     
+    token_version = payload.get("tv", 0)
+    if token_version < _revoked_versions.get((user_type, user_id), 0):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return user_type, user_id, token_version
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller as described by verified token claims, without an ORM lookup"""
+    user_type: str
+    id: int
+    is_profile_complete: bool
+    token_version: int
+
+    @property
+    def is_mahasiswa(self) -> bool:
+        return self.user_type == "mahasiswa"
+
+    @property
+    def is_kantin(self) -> bool:
+        return self.user_type == "kantin"
+
+    @property
+    def id_mahasiswa(self) -> Optional[int]:
+        return self.id if self.is_mahasiswa else None
+
+    @property
+    def id_kantin(self) -> Optional[int]:
+        return self.id if self.is_kantin else None
+
+def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Get the current caller from signed token claims, for read routes that need no user row"""
+    payload = verify_token(credentials.credentials)
+    user_type, user_id, token_version = read_claims(payload)
+    if user_type not in ("mahasiswa", "kantin"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid user type",
+        )
+    return Principal(user_type, user_id, bool(payload.get("pc", False)), token_version)
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Union[Mahasiswa, Kantin]:
+    """Get current authenticated user"""
+    user_type, user_id, _ = read_claims(verify_token(credentials.credentials))
+    
     if user_type == "mahasiswa":
         user = db.query(Mahasiswa).filter(Mahasiswa.id_mahasiswa == user_id).first()
     elif user_type == "kantin":
@@ -138,3 +266,11 @@ def get_current_kantin_with_profile(
             detail="Profile not complete. Please complete your profile first with tenant name, owner details, and operational hours."
         )
     return current_user
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow access to operational endpoints with the configured admin token"""
+    if not ADMIN_TOKEN or x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden: Admin only"
+        )
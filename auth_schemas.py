@@ -11,6 +11,15 @@ class TokenResponse(BaseModel):
     token_type: str
     user_type: str
     user_info: dict
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class RefreshResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
 
 class ChangePasswordRequest(BaseModel):
     current_password: str
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# name -> (interval seconds, sync callable)
+_jobs = {}
+_tasks = {}
+# Set when the app shuts down, so jobs stop after their current run
+_stopping = None
+
+def register_periodic(name: str, interval: float, func):
+    """Register a blocking job to run every interval seconds once the app starts"""
+    _jobs[name] = (interval, func)
+
+async def _run_periodic(name: str, interval: float, func, stopping: asyncio.Event):
+    while not stopping.is_set():
+        try:
+            await run_in_threadpool(func)
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        try:
+            await asyncio.wait_for(stopping.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+def start_jobs():
+    """Start every registered job on the running event loop"""
+    global _stopping
+    if _stopping is None or _stopping.is_set():
+        _stopping = asyncio.Event()
+    for name, (interval, func) in _jobs.items():
+        if name not in _tasks:
+            _tasks[name] = asyncio.create_task(_run_periodic(name, interval, func, _stopping), name=name)
+
+async def stop_jobs(timeout: float = None) -> int:
+    """Stop scheduling jobs and let a run in progress finish; returns how many were still running after timeout.
+
+    Jobs still running then are cancelled, but a run already in the threadpool cannot be
+    interrupted, so they are left to finish on their own rather than waited for.
+    """
+    if _stopping is not None:
+        _stopping.set()
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    if not tasks:
+        return 0
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        logger.warning("Background job %s did not finish before shutdown", task.get_name())
+        task.cancel()
+    return len(pending)
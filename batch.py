@@ -0,0 +1,18 @@
+import os
+from typing import List
+from fastapi import HTTPException, Query, status
+
+# Largest id list accepted by the GET .../batch endpoints
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+def batch_ids(ids: str = Query(..., description="Comma-separated ids, e.g. 1,2,3")) -> List[int]:
+    """Parse a comma-separated id list, dropping duplicates but keeping request order"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers")
+    if not parsed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must not be empty")
+    if len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    return parsed
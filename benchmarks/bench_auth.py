@@ -0,0 +1,56 @@
+"""Per-request authentication overhead.
+
+Times token verification with each JWT implementation, with and without the
+verified-token cache, and the two authentication dependencies built on it:
+get_current_principal (claims only) and get_current_user (claims plus a user
+lookup in an in-memory SQLite database).
+
+    python -m benchmarks.bench_auth
+"""
+from benchmarks.common import best_of
+from fastapi.security import HTTPAuthorizationCredentials
+import auth
+from database import engine, Base, SessionLocal
+from models import Mahasiswa
+
+CALLS = 2000
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+def use_backend(name: str):
+    auth.jwt_encode, auth.jwt_decode, auth.JWTDecodeError = auth.load_jwt_backend(name)
+
+def backends():
+    names = ["jose"]
+    try:
+        import jwt  # noqa: F401
+        names.append("pyjwt")
+    except ImportError:
+        print("PyJWT not installed, skipping the pyjwt backend")
+    return names
+
+def line(name: str, seconds: float):
+    print(f"{name:<48} {seconds * 1e6:8.2f} us/request")
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Mahasiswa(id_mahasiswa=1, nama="Mahasiswa", email="m@example.com", password=FAKE_HASH, nim="00000001"))
+    db.commit()
+
+    cache_size = auth.TOKEN_CACHE_SIZE or 4096
+    for backend in backends():
+        use_backend(backend)
+        token = auth.create_user_token("mahasiswa", 1, True, 0)
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        for cached in (False, True):
+            auth.TOKEN_CACHE_SIZE = cache_size if cached else 0
+            auth._token_cache.clear()
+            label = f"{backend}, {'cached' if cached else 'uncached'}"
+            line(f"verify_token ({label})", best_of(lambda: auth.verify_token(token), number=CALLS))
+            line(f"get_current_principal ({label})", best_of(lambda: auth.get_current_principal(credentials), number=CALLS))
+            line(f"get_current_user ({label})", best_of(lambda: auth.get_current_user(credentials, db), number=CALLS // 4))
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Memory and time of a 10k-row list response: full ORM entities vs column projection.
+
+Seeds an in-memory SQLite database, then builds the list payload both ways and
+reports the tracemalloc peak alongside wall time.
+
+    python -m benchmarks.bench_list_memory
+"""
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import List
+from benchmarks.common import report
+from pydantic import TypeAdapter
+from database import engine, Base, SessionLocal
+from models import Mahasiswa, Menu, Kantin, TipeMenuEnum
+from schemas import MahasiswaResponse, MenuResponse
+from responses import schema_columns, rows_response
+
+ROWS = 10_000
+# A bcrypt hash is 60 characters; every full Mahasiswa entity carries one
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+def seed(db):
+    db.add(Kantin(id_kantin=1, nama_kantin="Kantin", email="kantin@example.com", password=FAKE_HASH))
+    db.bulk_insert_mappings(Mahasiswa, [
+        {"id_mahasiswa": i, "nama": f"Mahasiswa {i}", "email": f"m{i}@example.com",
+         "password": FAKE_HASH, "nim": f"{i:08d}"}
+        for i in range(1, ROWS + 1)
+    ])
+    db.bulk_insert_mappings(Menu, [
+        {"id_menu": i, "id_kantin": 1, "nama_menu": f"Menu {i}", "harga": Decimal("12500.00"),
+         "tipe_menu": TipeMenuEnum.makanan}
+        for i in range(1, ROWS + 1)
+    ])
+    db.commit()
+
+def measure(label, build):
+    db = SessionLocal()
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = build(db)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    report(label, ROWS, elapsed)
+    print(f"{'':<40} peak={peak / 1024 / 1024:8.2f} MiB  body={len(body) / 1024:8.1f} KiB")
+
+def entity_path(model, schema):
+    adapter = TypeAdapter(List[schema])
+    def build(db):
+        items = db.query(model).all()
+        return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+    return build
+
+def projected_path(model, schema):
+    columns = schema_columns(model, schema)
+    def build(db):
+        return rows_response(db.query(*columns).all()).body
+    return build
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed(db)
+    db.close()
+    for model, schema in [(Mahasiswa, MahasiswaResponse), (Menu, MenuResponse)]:
+        name = model.__tablename__
+        measure(f"{name} full entities", entity_path(model, schema))
+        measure(f"{name} projected rows", projected_path(model, schema))
@@ -0,0 +1,57 @@
+"""Importing a kantin's menu: one POST /menu/ per item vs one POST /menu/bulk.
+
+The per-item path repeats what the create handler does for every request (user
+lookup for auth, insert, commit, refresh); the bulk path is menu_import.import_menu.
+Each size is imported into a fresh kantin, then re-imported to time updates.
+Uses in-memory SQLite unless DATABASE_URL points elsewhere; commits are far
+cheaper there than on a networked database, so the gap is a lower bound.
+
+    python -m benchmarks.bench_menu_bulk
+"""
+import time
+from decimal import Decimal
+from benchmarks.common import report
+from database import engine, Base, SessionLocal
+from models import Kantin, Menu
+from menu_import import import_menu
+
+SIZES = [100, 1000, 3000]
+FAKE_HASH = "$2b$12$" + "x" * 53
+
+def make_rows(n, price):
+    return [
+        {"nama_menu": f"Menu {i}", "harga": str(price), "tipe_menu": ("makanan", "minuman", "snack")[i % 3]}
+        for i in range(n)
+    ]
+
+def per_item(db, kantin_id, rows):
+    for row in rows:
+        db.get(Kantin, kantin_id)
+        db_menu = Menu(id_kantin=kantin_id, nama_menu=row["nama_menu"], harga=Decimal(row["harga"]), tipe_menu=row["tipe_menu"])
+        db.add(db_menu)
+        db.commit()
+        db.refresh(db_menu)
+        # Each request gets its own session, so nothing stays cached between items
+        db.expunge_all()
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    fn()
+    report(label, n, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for n in SIZES:
+        kantin_ids = []
+        for path in ("item", "bulk"):
+            kantin = Kantin(nama_kantin=f"Kantin {path} {n}", email=f"{path}{n}@example.com", password=FAKE_HASH)
+            db.add(kantin)
+            db.commit()
+            kantin_ids.append(kantin.id_kantin)
+
+        rows = make_rows(n, 10000)
+        timed(f"per-item create x{n}", n, lambda: per_item(db, kantin_ids[0], rows))
+        timed(f"bulk create x{n}", n, lambda: import_menu(db, kantin_ids[1], rows))
+        timed(f"bulk update x{n}", n, lambda: import_menu(db, kantin_ids[1], make_rows(n, 12000)))
+    db.close()
@@ -0,0 +1,65 @@
+"""Per-row serialization cost of list responses.
+
+Compares the default FastAPI path (ORM objects validated through response_model,
+then encoded with the standard json module) with the orjson response class and
+with the direct row -> dict path used by the list endpoints.
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import List
+from benchmarks.common import best_of, report
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from models import Menu, Pesanan, TipeMenuEnum, StatusPesananEnum
+from schemas import MenuResponse, PesananResponse
+from responses import dumps, schema_columns
+
+SIZES = [100, 500, 2000]
+
+def make_menus(n):
+    return [
+        Menu(id_menu=i, id_kantin=i % 40 + 1, nama_menu=f"Menu {i}", harga=Decimal("15000.00"),
+             img_menu=None, tipe_menu=TipeMenuEnum.makanan)
+        for i in range(1, n + 1)
+    ]
+
+def make_pesanan(n):
+    now = datetime.now(timezone.utc)
+    return [
+        Pesanan(id_pesanan=i, id_kantin=i % 40 + 1, id_mahasiswa=i % 3000 + 1, tanggal=now,
+                status=StatusPesananEnum.proses)
+        for i in range(1, n + 1)
+    ]
+
+def as_rows(objects, model, schema):
+    """Shape ORM objects like the column rows a projected query returns"""
+    names = [column.key for column in schema_columns(model, schema)]
+    return [{name: getattr(obj, name) for name in names} for obj in objects]
+
+def run(label, objects, model, schema):
+    adapter = TypeAdapter(List[schema])
+    rows = as_rows(objects, model, schema)
+    n = len(objects)
+
+    def stdlib_path():
+        validated = adapter.validate_python(objects, from_attributes=True)
+        json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    def orjson_path():
+        validated = adapter.validate_python(objects, from_attributes=True)
+        dumps(adapter.dump_python(validated, mode="json"))
+
+    def direct_path():
+        dumps(rows)
+
+    report(f"{label} response_model + json", n, best_of(stdlib_path))
+    report(f"{label} response_model + orjson", n, best_of(orjson_path))
+    report(f"{label} rows -> orjson", n, best_of(direct_path))
+
+if __name__ == "__main__":
+    for size in SIZES:
+        run("menu", make_menus(size), Menu, MenuResponse)
+        run("pesanan", make_pesanan(size), Pesanan, PesananResponse)
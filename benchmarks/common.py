@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+
+# Benchmarks run from the repository root against an in-memory database unless told otherwise
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+def best_of(fn, repeat: int = 5, number: int = 1) -> float:
+    """Return the best average seconds per call of fn over several runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def report(name: str, rows: int, seconds: float):
+    """Print one benchmark line with total and per-row cost"""
+    per_row = seconds / rows * 1e6 if rows else 0.0
+    print(f"{name:<40} rows={rows:<6} total={seconds * 1e3:9.3f} ms  per_row={per_row:7.3f} us")
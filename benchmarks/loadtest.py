@@ -0,0 +1,281 @@
+"""Lunch-rush load test against a locally booted API.
+
+Seeds a database with mahasiswa, kantin, menus and optionally order history
+(see benchmarks.seed), starts the app with uvicorn
+in a subprocess, then runs virtual users for a fixed duration:
+
+* mahasiswa (most users): log in, browse kantin and menus, check out an order
+  with a few lines, then poll its status;
+* kantin: log in, then read the order queue and complete orders.
+
+Reports throughput and p50/p95/p99 latency and error rate per route, and writes
+the same figures as JSON for comparing runs.
+
+    python -m benchmarks.loadtest --duration 60 --users 50 --output loadtest.json
+    python -m benchmarks.loadtest --database-url postgresql://localhost/kudakan_bench --workers 4
+
+The database is dropped and recreated, so never point it at real data. The
+default is a throwaway SQLite file, which serializes writes; use PostgreSQL for
+numbers that mean something.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+import httpx
+import orjson
+from benchmarks.common import ROOT
+
+PASSWORD = "loadtest-password"
+
+# Same addresses as benchmarks.seed, which can only be imported once DATABASE_URL is set
+def mahasiswa_email(i: int) -> str:
+    return f"mhs{i}@seed.example.com"
+
+def kantin_email(i: int) -> str:
+    return f"kantin{i}@seed.example.com"
+
+def configure_environment(database_url: str):
+    """Settings shared by the seeding step and the app subprocess"""
+    os.environ["DATABASE_URL"] = database_url
+    # Storage is not exercised, but the client is built at import time
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "loadtest.loadtest.loadtest")
+    # Every virtual user logs in from the same address
+    os.environ.setdefault("LOGIN_IP_BURST", "1000000")
+    os.environ.setdefault("LOGIN_IP_PER_MINUTE", "1000000")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API server did not become ready")
+
+class Recorder:
+    """Latencies and outcomes per route template"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, expected=(200, 201), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.latencies[route].append(time.perf_counter() - start)
+            self.errors[route] += 1
+            self.statuses[route]["transport"] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        self.statuses[route][str(response.status_code)] += 1
+        if response.status_code not in expected:
+            self.errors[route] += 1
+            return None
+        return response
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[route])
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors[route],
+            "error_rate": recorder.errors[route] / len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000,
+            "statuses": dict(recorder.statuses[route]),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    errors = sum(route["errors"] for route in routes.values())
+    return {
+        "elapsed_seconds": elapsed,
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "routes": routes,
+    }
+
+def skewed_choice(rng: random.Random, count: int) -> int:
+    """Pick 1..count with Zipf-like weights, so a few popular kantin get most of the traffic"""
+    return min(count, int(rng.paretovariate(1.2)))
+
+async def think(rng: random.Random, mean_seconds: float):
+    if mean_seconds > 0:
+        await asyncio.sleep(rng.expovariate(1 / mean_seconds))
+
+async def login(client, recorder, email):
+    response = await recorder.call(client, "POST /auth/login", "POST", "/api/v1/auth/login", json={"email": email, "password": PASSWORD})
+    if response is None:
+        return None
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def mahasiswa_session(client, recorder, rng, args, deadline):
+    id_mahasiswa = rng.randint(1, args.mahasiswa)
+    headers = await login(client, recorder, mahasiswa_email(id_mahasiswa))
+    if headers is None:
+        return
+    while time.monotonic() < deadline:
+        await recorder.call(client, "GET /kantin/", "GET", "/api/v1/kantin/", headers=headers)
+        await think(rng, args.think)
+        id_kantin = skewed_choice(rng, args.kantin)
+        await recorder.call(client, "GET /kantin/{id}/with-menus", "GET", f"/api/v1/kantin/{id_kantin}/with-menus", headers=headers)
+        response = await recorder.call(client, "GET /menu/kantin/{id}", "GET", f"/api/v1/menu/kantin/{id_kantin}", headers=headers, params={"sort": "popular"})
+        await think(rng, args.think)
+        if response is None or not response.json():
+            continue
+        menus = [menu["id_menu"] for menu in response.json()]
+
+        # Checkout: create the order, then add one to three lines
+        response = await recorder.call(client, "POST /pesanan/", "POST", "/api/v1/pesanan/", headers=headers,
+                                       json={"id_kantin": id_kantin, "id_mahasiswa": id_mahasiswa})
+        if response is None:
+            continue
+        id_pesanan = response.json()["id_pesanan"]
+        for id_menu in rng.sample(menus, min(len(menus), rng.randint(1, 3))):
+            await recorder.call(client, "POST /detail-pesanan/auto-calculate", "POST", "/api/v1/detail-pesanan/auto-calculate",
+                                headers=headers, params={"id_pesanan": id_pesanan, "id_menu": id_menu, "jumlah": rng.randint(1, 2)})
+
+        for _ in range(rng.randint(2, 5)):
+            await think(rng, args.think * 2)
+            if time.monotonic() >= deadline:
+                return
+            await recorder.call(client, "GET /pesanan/{id}", "GET", f"/api/v1/pesanan/{id_pesanan}", headers=headers)
+        await recorder.call(client, "GET /pesanan/{id}/with-details", "GET", f"/api/v1/pesanan/{id_pesanan}/with-details", headers=headers)
+        await think(rng, args.think * 5)
+
+async def kantin_session(client, recorder, rng, args, deadline):
+    id_kantin = skewed_choice(rng, args.kantin)
+    headers = await login(client, recorder, kantin_email(id_kantin))
+    if headers is None:
+        return
+    while time.monotonic() < deadline:
+        response = await recorder.call(client, "GET /pesanan/kantin/{id}", "GET", f"/api/v1/pesanan/kantin/{id_kantin}", headers=headers)
+        if response is not None:
+            waiting = [pesanan["id_pesanan"] for pesanan in response.json() if pesanan["status"] == "proses"]
+            for id_pesanan in waiting[:3]:
+                await recorder.call(client, "PUT /pesanan/{id}", "PUT", f"/api/v1/pesanan/{id_pesanan}", headers=headers, json={"status": "selesai"})
+        await think(rng, args.think * 4)
+
+async def virtual_user(number, client, recorder, args, deadline):
+    rng = random.Random(args.seed + number)
+    session = kantin_session if rng.random() < args.kantin_share else mahasiswa_session
+    # Stagger arrivals over the ramp-up period
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    while time.monotonic() < deadline:
+        await session(client, recorder, rng, args, deadline)
+        # Back off before logging in again after a failed session
+        await think(rng, args.think * 5)
+
+async def run_load(base_url: str, args) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(i, client, recorder, args, deadline) for i in range(args.users)))
+        elapsed = time.monotonic() - start
+    return summarize(recorder, elapsed)
+
+def print_report(result: dict):
+    print(f"{'route':<40} {'req':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<40} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate'] * 100:>6.2f}")
+    print(f"\n{result['requests']} requests in {result['elapsed_seconds']:.1f} s: "
+          f"{result['throughput_rps']:.1f} req/s, error rate {result['error_rate'] * 100:.2f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a local database, boot the API and replay lunch-rush traffic")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--mahasiswa", type=int, default=5000)
+    parser.add_argument("--kantin", type=int, default=40)
+    parser.add_argument("--menus", type=int, default=3000)
+    parser.add_argument("--orders", type=int, default=0, help="order history to seed; kantin queues list every order")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--kantin-share", type=float, default=0.1, help="fraction of users acting as kantin")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after startup")
+    parser.add_argument("--ramp-up", type=float, default=5)
+    parser.add_argument("--think", type=float, default=0.2, help="mean think time between steps, seconds")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse data already in the database")
+    parser.add_argument("--output", default=None, help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    tmpdir = None
+    database_url = args.database_url
+    if database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(tmpdir.name, 'loadtest.db')}"
+    configure_environment(database_url)
+
+    if not args.skip_seed:
+        # Imported after configure_environment, since the database engine is built at import time
+        from benchmarks.seed import seed_database
+        start = time.perf_counter()
+        seed_database(args.mahasiswa, args.kantin, args.menus, args.orders, password=PASSWORD,
+                      reset=True, seed=args.seed, log=lambda line: None)
+        print(f"Seeded {args.mahasiswa} mahasiswa, {args.kantin} kantin, {args.menus} menus, "
+              f"{args.orders} orders in {time.perf_counter() - start:.1f} s")
+
+    port = free_port()
+    server = start_server(port, args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_ready(base_url, server))
+        result = asyncio.run(run_load(base_url, args))
+    finally:
+        server.terminate()
+        server.wait()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    result["config"] = {key: value for key, value in vars(args).items() if key != "database_url"}
+    result["config"]["database"] = database_url.split(":", 1)[0]
+    print_report(result)
+    if args.output:
+        with open(args.output, "wb") as output:
+            output.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Microbenchmarks for per-request hot paths, with a local baseline to catch regressions.
+
+Cases: token verification, get_current_user with its user lookup, Pydantic
+serialization of PesananWithDetails / KantinWithMenus at several sizes,
+upload_image with the local storage backend, and the pesanan total computation.
+
+    python -m benchmarks.micro run                      # print timings
+    python -m benchmarks.micro run --save               # store them as the baseline
+    python -m benchmarks.micro compare --threshold 0.2  # exit 1 if any case is >20% slower than the baseline
+    python -m benchmarks.micro compare -k serialize     # only cases whose name contains "serialize"
+
+Timings depend on the machine, so the baseline is not committed (it is in
+.gitignore): record it with run --save on the machine that runs the
+comparison, e.g. before a change, then compare after it.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+import orjson
+from benchmarks.common import best_of
+
+# Uploads go to a throwaway directory instead of Supabase
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="kudakan-micro-"))
+
+from fastapi import UploadFile
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.datastructures import Headers
+import auth
+from database import engine, Base, SessionLocal
+from models import Mahasiswa, Kantin, Menu, Pesanan, DetailPesanan, TipeMenuEnum, StatusPesananEnum
+from schemas import PesananWithDetails, KantinWithMenus
+from routers.detail_pesanan import get_pesanan_total
+from supabase_storage import upload_image, LOCAL_STORAGE_DIR
+
+# Machine-specific, written by run --save and ignored by git
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+FAKE_HASH = "$2b$12$" + "x" * 53
+DETAIL_SIZES = [1, 10, 50]
+MENU_SIZES = [10, 100, 1000]
+IMAGE_SIZES = [64 * 1024, 1024 * 1024]
+TOTAL_SIZES = [1, 20]
+RUN_SECONDS = 0.05
+
+def setup_database():
+    """In-memory database with one mahasiswa, one kantin and one pesanan per TOTAL_SIZES entry"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Mahasiswa(id_mahasiswa=1, nama="Mahasiswa", email="m@example.com", password=FAKE_HASH, nim="00000001"))
+    db.add(Kantin(id_kantin=1, nama_kantin="Kantin", email="k@example.com", password=FAKE_HASH))
+    db.add(Menu(id_menu=1, id_kantin=1, nama_menu="Menu", harga=Decimal("15000.00"), tipe_menu=TipeMenuEnum.makanan))
+    for id_pesanan, lines in enumerate(TOTAL_SIZES, start=1):
+        db.add(Pesanan(id_pesanan=id_pesanan, id_kantin=1, id_mahasiswa=1, status=StatusPesananEnum.proses))
+        db.add_all(DetailPesanan(id_pesanan=id_pesanan, id_menu=1, jumlah=2, harga_total=Decimal("30000.00")) for _ in range(lines))
+    db.commit()
+    return db
+
+def pesanan_with_details(lines: int) -> dict:
+    return {
+        "id_pesanan": 1, "id_kantin": 1, "id_mahasiswa": 1, "status": "proses",
+        "tanggal": datetime(2025, 1, 6, 12, 15, tzinfo=timezone.utc),
+        "detail_pesanan": [
+            {"id_detail": i, "id_pesanan": 1, "id_menu": i, "jumlah": 2, "harga_total": Decimal("30000.00")}
+            for i in range(1, lines + 1)
+        ],
+        "mahasiswa": {"id_mahasiswa": 1, "nama": "Mahasiswa", "email": "m@example.com", "nim": "00000001",
+                      "alamat_pengiriman": "Gedung A", "nomor_hp": "0811111111", "is_profile_complete": True},
+        "kantin": {"id_kantin": 1, "nama_kantin": "Kantin", "email": "k@example.com", "nama_tenant": "Tenant",
+                   "nama_pemilik": "Pemilik", "nomor_pemilik": "0800000000", "jam_operasional": "07:00-17:00",
+                   "is_profile_complete": True},
+    }
+
+def kantin_with_menus(menus: int) -> dict:
+    return {
+        "id_kantin": 1, "nama_kantin": "Kantin", "email": "k@example.com", "nama_tenant": "Tenant",
+        "nama_pemilik": "Pemilik", "nomor_pemilik": "0800000000", "jam_operasional": "07:00-17:00",
+        "is_profile_complete": True,
+        "menu": [
+            {"id_menu": i, "id_kantin": 1, "nama_menu": f"Menu {i}", "harga": Decimal("15000.00"),
+             "img_menu": None, "tipe_menu": "makanan"}
+            for i in range(1, menus + 1)
+        ],
+    }
+
+def cases(db):
+    """Yield (name, function) pairs"""
+    loop = asyncio.new_event_loop()
+    token = auth.create_user_token("mahasiswa", 1, True, 0)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    cache_size = auth.TOKEN_CACHE_SIZE
+
+    def uncached(fn):
+        def run():
+            auth.TOKEN_CACHE_SIZE = 0
+            try:
+                fn()
+            finally:
+                auth.TOKEN_CACHE_SIZE = cache_size
+        return run
+
+    yield "auth.verify_token uncached", uncached(lambda: auth.verify_token(token))
+    if cache_size:
+        yield "auth.verify_token cached", lambda: auth.verify_token(token)
+    yield "auth.get_current_user", lambda: auth.get_current_user(credentials, db)
+
+    for lines in DETAIL_SIZES:
+        data = pesanan_with_details(lines)
+        yield f"serialize.PesananWithDetails details={lines}", lambda data=data: PesananWithDetails.model_validate(data).model_dump_json()
+    for menus in MENU_SIZES:
+        data = kantin_with_menus(menus)
+        yield f"serialize.KantinWithMenus menus={menus}", lambda data=data: KantinWithMenus.model_validate(data).model_dump_json()
+
+    for size in IMAGE_SIZES:
+        payload = os.urandom(size)
+
+        def upload(payload=payload):
+            file = UploadFile(io.BytesIO(payload), filename="menu.jpg", headers=Headers({"content-type": "image/jpeg"}))
+            url = loop.run_until_complete(upload_image(file))
+            os.remove(os.path.join(LOCAL_STORAGE_DIR, url.rsplit("/", 1)[-1]))
+        yield f"storage.upload_image local {size // 1024}KiB", upload
+
+    principal = auth.Principal("mahasiswa", 1, True, 0)
+    for id_pesanan, lines in enumerate(TOTAL_SIZES, start=1):
+        yield f"detail_pesanan.total lines={lines}", lambda id_pesanan=id_pesanan: loop.run_until_complete(
+            get_pesanan_total(id_pesanan, db=db, current_user=principal)
+        )
+
+def calls_per_run(fn) -> int:
+    """Calls needed for one timing run to last about RUN_SECONDS, so fast cases are not dominated by timer noise"""
+    start = time.perf_counter()
+    fn()
+    return max(1, int(RUN_SECONDS / max(time.perf_counter() - start, 1e-7)))
+
+def measure(pattern: str = None, repeat: int = 7) -> dict:
+    """Best microseconds per call of every case matching pattern"""
+    db = setup_database()
+    results = {}
+    try:
+        for name, fn in cases(db):
+            if pattern and pattern not in name:
+                continue
+            fn()  # warm up caches and lazy imports
+            results[name] = best_of(fn, repeat=repeat, number=calls_per_run(fn)) * 1e6
+            print(f"{name:<48} {results[name]:10.2f} us", flush=True)
+    finally:
+        db.close()
+    return results
+
+def load_baseline(path: str) -> dict:
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())["cases"]
+
+def save_baseline(path: str, results: dict):
+    document = {"python": sys.version.split()[0], "recorded": datetime.now(timezone.utc).isoformat(), "cases": results}
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(document, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print current vs baseline per case and return the names that regressed beyond threshold"""
+    regressions = []
+    print(f"\n{'case':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<48} {'-':>10} {current:10.2f}      new")
+            continue
+        change = current / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48} {before:10.2f} {current:10.2f} {change * 100:+7.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hot-path microbenchmarks and compare them with a stored baseline")
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="run: store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="compare: allowed slowdown as a fraction")
+    parser.add_argument("-k", dest="pattern", default=None, help="only cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "compare" and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline}; record one with: python -m benchmarks.micro run --save")
+
+    results = measure(args.pattern, args.repeat)
+    if args.command == "run":
+        if args.save:
+            if args.pattern and os.path.exists(args.baseline):
+                # Partial runs only replace the cases they measured
+                results = {**load_baseline(args.baseline), **results}
+            save_baseline(args.baseline, results)
+            print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\nNo regressions above {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Bulk-generate realistic data for benchmarks: mahasiswa, kantin, menus and months of orders.
+
+Popularity is skewed (a few kantin and, within each kantin, a few menus get
+most orders), orders cluster around breakfast, lunch and afternoon peaks, and
+weekends are quieter. Every account shares one precomputed password hash, so no
+per-user hashing happens. PostgreSQL is loaded with COPY; other databases get
+batched multi-row inserts. Afterwards the akun login index, sales rollups and
+popularity ranking are rebuilt from the new data.
+
+    python -m benchmarks.seed --reset --mahasiswa 20000 --kantin 40 --menus 3000 --orders 1000000 --days 120
+    DATABASE_URL=postgresql://localhost/kudakan_bench python -m benchmarks.seed --reset
+
+--reset drops and recreates every table; never point it at real data.
+"""
+import argparse
+import bisect
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from benchmarks.common import ROOT  # noqa: F401  (puts the repository root on sys.path)
+from database import engine, Base, SessionLocal
+from models import Mahasiswa, Kantin, Menu, Pesanan, DetailPesanan, TipeMenuEnum, StatusPesananEnum
+
+DEFAULT_PASSWORD = "kudakan-seed"
+BATCH_SIZE = 20000
+TIPE = [tipe.name for tipe in TipeMenuEnum]
+
+# (weight, mean hour, standard deviation in hours) of the daily order peaks
+DAILY_PEAKS = [(0.2, 8.5, 0.6), (0.6, 12.2, 0.7), (0.2, 15.5, 1.0)]
+# Relative order volume Monday..Sunday
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.9, 0.4, 0.2]
+OPENING_HOUR, CLOSING_HOUR = 7, 18
+
+def mahasiswa_email(i: int) -> str:
+    return f"mhs{i}@seed.example.com"
+
+def kantin_email(i: int) -> str:
+    return f"kantin{i}@seed.example.com"
+
+def zipf_cum_weights(n: int, exponent: float):
+    """Cumulative weights for random.choices where rank r has weight 1 / r**exponent"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+class Loader:
+    """Writes row tuples into a table with COPY on PostgreSQL or multi-row inserts elsewhere"""
+
+    def __init__(self):
+        self.postgres = engine.dialect.name == "postgresql"
+
+    def write(self, table, columns, rows, batch_size: int = BATCH_SIZE) -> int:
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._flush(table, columns, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._flush(table, columns, batch)
+            count += len(batch)
+        return count
+
+    def _flush(self, table, columns, batch):
+        if self.postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            raw = engine.raw_connection()
+            try:
+                with raw.cursor() as cursor:
+                    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+                raw.commit()
+            finally:
+                raw.close()
+        else:
+            with engine.begin() as connection:
+                connection.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+
+    def reset_sequences(self):
+        """Move serial sequences past the explicitly numbered rows"""
+        if not self.postgres:
+            return
+        with engine.begin() as connection:
+            for model, key in ((Mahasiswa, "id_mahasiswa"), (Kantin, "id_kantin"), (Menu, "id_menu"),
+                               (Pesanan, "id_pesanan"), (DetailPesanan, "id_detail")):
+                table = model.__tablename__
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), COALESCE((SELECT MAX({key}) FROM {table}), 1))"
+                )
+
+def next_id(model, key: str) -> int:
+    db = SessionLocal()
+    try:
+        return (db.query(getattr(model, key)).order_by(getattr(model, key).desc()).limit(1).scalar() or 0) + 1
+    finally:
+        db.close()
+
+def order_times(rng: random.Random, count: int, days: int, now: datetime):
+    """Order timestamps over the last `days` days following the weekday and daily peak model"""
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_list = [start + timedelta(days=offset) for offset in range(days + 1)]
+    day_weights = list(itertools.accumulate(WEEKDAY_WEIGHTS[day.weekday()] for day in day_list))
+    peak_weights = list(itertools.accumulate(weight for weight, _, _ in DAILY_PEAKS))
+    for day in rng.choices(day_list, cum_weights=day_weights, k=count):
+        _, mean, deviation = DAILY_PEAKS[bisect.bisect(peak_weights, rng.random() * peak_weights[-1])]
+        hour = min(max(rng.gauss(mean, deviation), OPENING_HOUR), CLOSING_HOUR - 1e-6)
+        moment = day + timedelta(hours=hour)
+        # Times later today move to the same time a week earlier, keeping the weekday and hour shape
+        yield moment if moment <= now else moment - timedelta(days=7)
+
+def seed_database(mahasiswa: int, kantin: int, menus: int, orders: int = 0, days: int = 90,
+                  password: str = DEFAULT_PASSWORD, password_hash: str = None, reset: bool = False,
+                  seed: int = 1, utc_offset: float = 7, derived: bool = True, log=print):
+    """Generate and load a dataset; returns the number of rows written per table"""
+    from accounts import rebuild_accounts
+    from auth import get_password_hash
+
+    rng = random.Random(seed)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    loader = Loader()
+    counts = {}
+    started = time.perf_counter()
+
+    def step(name, written):
+        counts[name] = written
+        log(f"{name:<16} {written:>10} rows  {time.perf_counter() - started:7.1f} s")
+
+    # One hash for every account: logging in works, but no per-user hashing cost
+    password_hash = password_hash or get_password_hash(password)
+
+    first_kantin = next_id(Kantin, "id_kantin")
+    kantin_ids = range(first_kantin, first_kantin + kantin)
+    step("kantin", loader.write(Kantin.__table__, (
+        "id_kantin", "nama_kantin", "email", "password", "nama_tenant", "nama_pemilik",
+        "nomor_pemilik", "jam_operasional", "is_profile_complete",
+    ), (
+        (i, f"Kantin {i}", kantin_email(i), password_hash, f"Tenant {i}", f"Pemilik {i}",
+         f"08{rng.randrange(10 ** 9):09d}", f"{OPENING_HOUR:02d}:00-{CLOSING_HOUR:02d}:00", True)
+        for i in kantin_ids
+    )))
+
+    first_mahasiswa = next_id(Mahasiswa, "id_mahasiswa")
+    mahasiswa_ids = range(first_mahasiswa, first_mahasiswa + mahasiswa)
+    step("mahasiswa", loader.write(Mahasiswa.__table__, (
+        "id_mahasiswa", "nama", "email", "password", "nim", "alamat_pengiriman", "nomor_hp", "is_profile_complete",
+    ), (
+        (i, f"Mahasiswa {i}", mahasiswa_email(i), password_hash, f"{i:010d}",
+         f"Gedung {chr(65 + i % 8)} Ruang {i % 300}", f"08{rng.randrange(10 ** 9):09d}", True)
+        for i in mahasiswa_ids
+    )))
+
+    first_menu = next_id(Menu, "id_menu")
+    menu_rows = [
+        (i, kantin_ids[(i - first_menu) % kantin], f"Menu {i}", rng.randrange(3, 40) * 1000, rng.choice(TIPE))
+        for i in range(first_menu, first_menu + menus)
+    ]
+    step("menu", loader.write(Menu.__table__, ("id_menu", "id_kantin", "nama_menu", "harga", "tipe_menu"), menu_rows))
+
+    if orders:
+        # Skewed popularity: kantin by rank, menus by rank within their kantin, some students order far more
+        menus_by_kantin = {}
+        for id_menu, id_kantin, _, harga, _ in menu_rows:
+            menus_by_kantin.setdefault(id_kantin, []).append((id_menu, harga))
+        kantin_with_menus = [id_kantin for id_kantin in kantin_ids if id_kantin in menus_by_kantin]
+        rng.shuffle(kantin_with_menus)
+        kantin_weights = zipf_cum_weights(len(kantin_with_menus), 0.8)
+        menu_weights = {id_kantin: zipf_cum_weights(len(items), 1.1) for id_kantin, items in menus_by_kantin.items()}
+        student_order = list(mahasiswa_ids)
+        rng.shuffle(student_order)
+        student_weights = zipf_cum_weights(len(student_order), 0.5)
+
+        tz = timezone(timedelta(hours=utc_offset))
+        now = datetime.now(tz)
+        recent = now - timedelta(hours=1)
+        first_pesanan = next_id(Pesanan, "id_pesanan")
+        first_detail = next_id(DetailPesanan, "id_detail")
+        details = []
+
+        def pesanan_rows():
+            id_detail = first_detail
+            picks = zip(
+                rng.choices(kantin_with_menus, cum_weights=kantin_weights, k=orders),
+                rng.choices(student_order, cum_weights=student_weights, k=orders),
+                order_times(rng, orders, days, now),
+            )
+            for offset, (id_kantin, id_mahasiswa, tanggal) in enumerate(picks):
+                id_pesanan = first_pesanan + offset
+                status = StatusPesananEnum.proses.name if tanggal >= recent else StatusPesananEnum.selesai.name
+                yield (id_pesanan, id_kantin, id_mahasiswa, tanggal, status)
+
+                lines = 1 + min(3, int(rng.expovariate(1.2)))
+                items = menus_by_kantin[id_kantin]
+                for id_menu, harga in {item[0]: item for item in rng.choices(items, cum_weights=menu_weights[id_kantin], k=lines)}.values():
+                    jumlah = 1 if rng.random() < 0.8 else 2
+                    details.append((id_detail, id_pesanan, id_menu, jumlah, harga * jumlah))
+                    id_detail += 1
+
+        pesanan_columns = ("id_pesanan", "id_kantin", "id_mahasiswa", "tanggal", "status")
+        detail_columns = ("id_detail", "id_pesanan", "id_menu", "jumlah", "harga_total")
+        written_pesanan = written_detail = 0
+        rows = pesanan_rows()
+        while True:
+            batch = list(itertools.islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            written_pesanan += loader.write(Pesanan.__table__, pesanan_columns, batch)
+            # Detail lines are generated alongside their orders, so each batch of orders brings its own lines
+            written_detail += loader.write(DetailPesanan.__table__, detail_columns, details)
+            details.clear()
+        step("pesanan", written_pesanan)
+        step("detail_pesanan", written_detail)
+
+    loader.reset_sequences()
+
+    db = SessionLocal()
+    try:
+        # Bulk loading bypasses the mapper events that maintain the login index
+        step("akun", rebuild_accounts(db))
+        if derived and orders:
+            from analytics import rebuild_rollups
+            from popularity import refresh_popularity
+            hours, menu_days = rebuild_rollups(db)
+            step("rekap", hours + menu_days)
+            step("skor_menu", refresh_popularity(db))
+    finally:
+        db.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-generate benchmark data into DATABASE_URL")
+    parser.add_argument("--mahasiswa", type=int, default=20000)
+    parser.add_argument("--kantin", type=int, default=40)
+    parser.add_argument("--menus", type=int, default=3000)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=90, help="history length for orders")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="login password of every generated account")
+    parser.add_argument("--password-hash", default=None, help="use this precomputed hash instead of hashing --password")
+    parser.add_argument("--utc-offset", type=float, default=7, help="campus timezone for daily peaks, hours from UTC")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--no-derived", action="store_true", help="skip rebuilding rollups and popularity")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = seed_database(
+        args.mahasiswa, args.kantin, args.menus, args.orders, args.days,
+        password=args.password, password_hash=args.password_hash, reset=args.reset,
+        seed=args.seed, utc_offset=args.utc_offset, derived=not args.no_derived,
+    )
+    print(f"Loaded {sum(counts.values())} rows in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,14 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
+def insert_for(db):
+    """Return the dialect-specific insert construct, which supports ON CONFLICT upserts"""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,109 @@
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, Optional
+from database import SessionLocal
+from models import Pesanan, DetailPesanan, Menu
+from responses import dumps
+
+# Rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 1000
+# Bytes buffered before a chunk is handed to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+CSV_HEADER = [
+    "id_pesanan", "tanggal", "status", "id_mahasiswa",
+    "id_detail", "id_menu", "nama_menu", "jumlah", "harga_total",
+]
+
+def _iter_rows(kantin_id: int, date_from: Optional[datetime], date_to: Optional[datetime]):
+    """Stream joined pesanan/detail/menu rows for a kantin in order, using a server-side cursor"""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Pesanan.id_pesanan, Pesanan.tanggal, Pesanan.status, Pesanan.id_mahasiswa,
+            DetailPesanan.id_detail, DetailPesanan.id_menu, Menu.nama_menu,
+            DetailPesanan.jumlah, DetailPesanan.harga_total,
+        ).outerjoin(
+            DetailPesanan, DetailPesanan.id_pesanan == Pesanan.id_pesanan
+        ).outerjoin(
+            Menu, Menu.id_menu == DetailPesanan.id_menu
+        ).filter(Pesanan.id_kantin == kantin_id)
+
+        if date_from is not None:
+            query = query.filter(Pesanan.tanggal >= date_from)
+        if date_to is not None:
+            query = query.filter(Pesanan.tanggal < date_to)
+
+        query = query.order_by(Pesanan.tanggal, Pesanan.id_pesanan, DetailPesanan.id_detail)
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            yield row
+    finally:
+        db.close()
+
+def iter_pesanan_export(kantin_id: int, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Iterator[dict]:
+    """Yield one dict per pesanan with its lines and totals, holding a single order in memory"""
+    current = None
+    for row in _iter_rows(kantin_id, date_from, date_to):
+        if current is None or current["id_pesanan"] != row.id_pesanan:
+            if current is not None:
+                yield current
+            current = {
+                "id_pesanan": row.id_pesanan,
+                "tanggal": row.tanggal,
+                "status": row.status,
+                "id_mahasiswa": row.id_mahasiswa,
+                "total_harga": Decimal("0"),
+                "total_item": 0,
+                "detail_pesanan": [],
+            }
+        if row.id_detail is not None:
+            current["detail_pesanan"].append({
+                "id_detail": row.id_detail,
+                "id_menu": row.id_menu,
+                "nama_menu": row.nama_menu,
+                "jumlah": row.jumlah,
+                "harga_total": row.harga_total,
+            })
+            current["total_harga"] += row.harga_total
+            current["total_item"] += row.jumlah
+    if current is not None:
+        yield current
+
+def _chunked(pieces: Iterator[bytes]) -> Iterator[bytes]:
+    """Group small encoded pieces into chunks of roughly EXPORT_CHUNK_SIZE bytes"""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+def stream_ndjson(kantin_id: int, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Iterator[bytes]:
+    """Encode the export as newline-delimited JSON, one pesanan per line"""
+    return _chunked(dumps(order) + b"\n" for order in iter_pesanan_export(kantin_id, date_from, date_to))
+
+def stream_csv(kantin_id: int, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None) -> Iterator[bytes]:
+    """Encode the export as CSV, one line item per row"""
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        writer.writerow(CSV_HEADER)
+        yield flush()
+        for row in _iter_rows(kantin_id, date_from, date_to):
+            writer.writerow([
+                row.id_pesanan, row.tanggal.isoformat() if row.tanggal else "", row.status.value,
+                row.id_mahasiswa, row.id_detail, row.id_menu, row.nama_menu, row.jumlah, row.harga_total,
+            ])
+            yield flush()
+    return _chunked(lines())
@@ -0,0 +1,82 @@
+from typing import Optional, get_args
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+# A selection maps each selected field to None (a column) or to the selection of a nested schema,
+# in the schema's field order so pruned output keeps the usual key order.
+
+_full_selections = {}
+
+def _nested_schema(annotation) -> Optional[type]:
+    """The response model inside annotations like Optional[X] or List[X], or None for plain values"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+def full_selection(schema) -> dict:
+    """Selection of every field of a schema, including nested ones"""
+    selection = _full_selections.get(schema)
+    if selection is None:
+        selection = {}
+        for name, field in schema.model_fields.items():
+            nested = _nested_schema(field.annotation)
+            selection[name] = None if nested is None else full_selection(nested)
+        _full_selections[schema] = selection
+    return selection
+
+def _ordered(selection: dict, full: dict) -> dict:
+    return {
+        name: None if full[name] is None else _ordered(selection[name], full[name])
+        for name in full if name in selection
+    }
+
+def parse_fields(fields: str, schema) -> dict:
+    """Parse "a,b,relation.c" into a selection checked against a schema.
+
+    Naming a relation without a sub-field selects all of its fields.
+    """
+    full = full_selection(schema)
+    selection = {}
+    for path in (part.strip() for part in fields.split(",")):
+        if not path:
+            continue
+        node, available = selection, full
+        names = path.split(".")
+        for depth, name in enumerate(names):
+            if name not in available or (available[name] is None and depth < len(names) - 1):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown field: {path}")
+            if available[name] is None:
+                node[name] = None
+            elif depth == len(names) - 1:
+                node[name] = available[name]
+            else:
+                node = node.setdefault(name, {})
+                available = available[name]
+    if not selection:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="fields must name at least one field")
+    return _ordered(selection, full)
+
+def field_selection(schema):
+    """Dependency reading fields= for a response schema; every field is selected when it is absent"""
+    def dependency(fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id_menu,nama_menu or kantin.nama_kantin")) -> dict:
+        return full_selection(schema) if fields is None else parse_fields(fields, schema)
+    return dependency
+
+def select_columns(model, selection: dict, *required: str) -> tuple:
+    """Model columns for the selected plain fields, plus columns needed for lookups or access checks"""
+    table_columns = model.__table__.columns
+    names = [name for name, nested in selection.items() if nested is None and name in table_columns]
+    names += [name for name in required if name not in names]
+    return tuple(getattr(model, name) for name in names)
+
+def prune(row: dict, selection: dict) -> dict:
+    """Keep only the selected keys of a row, dropping columns fetched for internal use"""
+    return {name: row[name] for name in selection if name in row}
+
+def selection_key(selection: dict) -> tuple:
+    """Hashable form of a selection, for cache and single-flight keys"""
+    return tuple((name, None if nested is None else selection_key(nested)) for name, nested in selection.items())
@@ -0,0 +1,146 @@
+import asyncio
+import math
+import os
+import time
+from fastapi import APIRouter
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from database import engine
+from responses import ORJSONResponse
+import supabase_storage
+from loop_watchdog import loop_watchdog
+from request_context import is_draining
+
+# Readiness results are reused for this long, so frequent probes do not add load
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "2"))
+HEALTH_STORAGE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_STORAGE_TIMEOUT_SECONDS", "3"))
+# Pool use and event-loop lag above these mark the instance as degraded (still ready)
+HEALTH_POOL_SATURATION_MAX = float(os.getenv("HEALTH_POOL_SATURATION_MAX", "0.9"))
+HEALTH_LOOP_LAG_MAX_MS = float(os.getenv("HEALTH_LOOP_LAG_MAX_MS", "200"))
+
+router = APIRouter()
+
+async def run_with_timeout(func, timeout: float):
+    """Run a blocking check in a worker thread, giving up on it after timeout.
+
+    run_in_threadpool cannot be abandoned (cancelling it still waits for the thread),
+    so the loop's default executor is used for checks that may hang.
+    """
+    return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, func), timeout)
+
+def _ping_connect_args() -> dict:
+    if engine.dialect.name == "postgresql":
+        return {"connect_timeout": max(1, math.ceil(HEALTH_DB_TIMEOUT_SECONDS))}
+    if engine.dialect.name == "sqlite":
+        return {"timeout": HEALTH_DB_TIMEOUT_SECONDS}
+    return {}
+
+# A saturated app pool must not fail the probe, so the ping opens its own short-lived connection
+ping_engine = create_engine(engine.url, poolclass=NullPool, connect_args=_ping_connect_args())
+
+def _ping_database():
+    with ping_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+async def check_database() -> dict:
+    start = time.perf_counter()
+    try:
+        await run_with_timeout(_ping_database, HEALTH_DB_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"no response within {HEALTH_DB_TIMEOUT_SECONDS:g} s"}
+    except Exception as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+def pool_stats() -> dict:
+    """Connections in use against the pool's capacity; pools without a fixed size report no saturation"""
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    if not hasattr(pool, "checkedout"):
+        return stats
+    size, max_overflow = pool.size(), getattr(pool, "_max_overflow", 0)
+    stats.update({"size": size, "checked_out": pool.checkedout(), "overflow": pool.overflow(), "max_overflow": max_overflow})
+    # A negative max_overflow means the pool can grow without limit
+    if max_overflow >= 0 and size + max_overflow > 0:
+        stats["saturation"] = round(pool.checkedout() / (size + max_overflow), 3)
+        stats["ok"] = stats["saturation"] < HEALTH_POOL_SATURATION_MAX
+    return stats
+
+def _check_storage():
+    if supabase_storage.STORAGE_BACKEND == "local":
+        if not os.access(supabase_storage.LOCAL_STORAGE_DIR, os.W_OK):
+            raise OSError(f"{supabase_storage.LOCAL_STORAGE_DIR} is not writable")
+        return
+    supabase_storage.supabase.storage.get_bucket(supabase_storage.SUPABASE_BUCKET_NAME)
+
+async def check_storage() -> dict:
+    start = time.perf_counter()
+    try:
+        await run_with_timeout(_check_storage, HEALTH_STORAGE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"ok": False, "backend": supabase_storage.STORAGE_BACKEND, "error": f"no response within {HEALTH_STORAGE_TIMEOUT_SECONDS:g} s"}
+    except Exception as exc:
+        return {"ok": False, "backend": supabase_storage.STORAGE_BACKEND, "error": str(exc)}
+    return {"ok": True, "backend": supabase_storage.STORAGE_BACKEND, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+async def check_loop_lag() -> dict:
+    """Recent event-loop lag from the watchdog, or how long a callback waits for its turn right now"""
+    if loop_watchdog.running:
+        lag_ms = loop_watchdog.recent_max_lag_ms()
+        return {"ok": lag_ms < HEALTH_LOOP_LAG_MAX_MS, "lag_ms": round(lag_ms, 3)}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.sleep(0)
+    lag_ms = (loop.time() - start) * 1000
+    return {"ok": lag_ms < HEALTH_LOOP_LAG_MAX_MS, "lag_ms": round(lag_ms, 3)}
+
+async def readiness() -> dict:
+    database, storage, loop_lag = await asyncio.gather(check_database(), check_storage(), check_loop_lag())
+    checks = {"database": database, "pool": pool_stats(), "storage": storage, "event_loop": loop_lag}
+    if not database["ok"]:
+        status = "not_ready"
+    elif all(check.get("ok", True) for check in checks.values()):
+        status = "ready"
+    else:
+        # Storage problems only affect image uploads, so the instance keeps taking traffic
+        status = "degraded"
+    return {"status": status, "checked_at": time.time(), "checks": checks}
+
+class ReadinessCache:
+    """Latest readiness result; concurrent probes after it expires share one check"""
+
+    def __init__(self, ttl: float = HEALTH_CACHE_SECONDS):
+        self.ttl = ttl
+        self._result = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> dict:
+        if self._result is not None and time.monotonic() < self._expires:
+            return self._result
+        async with self._lock:
+            if self._result is None or time.monotonic() >= self._expires:
+                self._result = await readiness()
+                self._expires = time.monotonic() + self.ttl
+        return self._result
+
+readiness_cache = ReadinessCache()
+
+@router.get("/health")
+@router.get("/health/live")
+async def liveness():
+    """The process is up and serving requests; dependencies are not checked"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def ready():
+    """Whether this instance can serve traffic: database, connection pool, storage and event-loop lag"""
+    # Shutting down: load balancers should stop sending traffic before the listener closes
+    if is_draining():
+        return ORJSONResponse(
+            {"status": "not_ready", "checked_at": time.time(), "checks": {"shutdown": {"ok": False, "error": "draining"}}},
+            status_code=503
+        )
+    result = await readiness_cache.get()
+    return ORJSONResponse(result, status_code=503 if result["status"] == "not_ready" else 200)
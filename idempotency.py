@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+import orjson
+from fastapi import HTTPException, Response, status
+from starlette.concurrency import run_in_threadpool
+from responses import dumps
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+MAX_KEY_LENGTH = 255
+
+class IdempotencyStore:
+    """Bounded in-memory store of completed responses per idempotency key, with TTL eviction.
+
+    Entries hold only a request fingerprint, the status code and the encoded body.
+    The write runs in the threadpool, so requests with a key that is still
+    executing wait for the first one instead of running again.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, max_entries: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (expires_at, fingerprint, status_code, body), oldest first
+        self._entries = OrderedDict()
+        # key -> (fingerprint, task resolving to (status_code, body))
+        self._inflight = {}
+
+    def _evict(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def _check(self, fingerprint: bytes, stored: bytes):
+        if fingerprint != stored:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+
+    async def _run(self, key: str, fingerprint: bytes, func):
+        try:
+            status_code, body = await run_in_threadpool(func)
+        finally:
+            self._inflight.pop(key, None)
+        # Failures are not stored, so a later retry executes again
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, status_code, body)
+        self._evict(time.monotonic())
+        return status_code, body
+
+    async def execute(self, key: str, fingerprint: bytes, func):
+        """Run the blocking func once per key and return (status_code, body, replayed).
+
+        The write runs as its own task, so its result is stored (and handed to
+        waiting duplicates) even when the request that started it is cancelled.
+        """
+        now = time.monotonic()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._check(fingerprint, entry[1])
+            return entry[2], entry[3], True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._check(fingerprint, inflight[0])
+            status_code, body = await asyncio.shield(inflight[1])
+            return status_code, body, True
+
+        task = asyncio.create_task(self._run(key, fingerprint, func))
+        # Mark a failure as retrieved even when nobody is left waiting on it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = (fingerprint, task)
+        try:
+            status_code, body = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # The write still uses this request's session, so it must finish before the request unwinds
+            await asyncio.wait({task})
+            raise
+        return status_code, body, False
+
+idempotency_store = IdempotencyStore()
+
+def _fingerprint(payload) -> bytes:
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump(mode="json")
+    return hashlib.sha256(orjson.dumps(payload, default=str, option=orjson.OPT_SORT_KEYS)).digest()
+
+async def idempotent(idempotency_key: Optional[str], scope: str, payload, schema, func, status_code: int = status.HTTP_200_OK):
+    """Execute a write at most once per Idempotency-Key and replay its response for repeats.
+
+    func performs the write and returns the ORM object to serialize with schema.
+    Without a key the object is returned unchanged for the regular response_model path.
+    """
+    if idempotency_key is None:
+        return func()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key header")
+
+    def run():
+        return status_code, dumps(schema.model_validate(func()).model_dump(mode="json"))
+
+    stored_status, body, replayed = await idempotency_store.execute(
+        f"{scope}:{idempotency_key}", _fingerprint(payload), run
+    )
+    headers = {"Idempotency-Replayed": "true"} if replayed else None
+    return Response(content=body, status_code=stored_status, media_type="application/json", headers=headers)
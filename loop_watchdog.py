@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime, timezone
+from request_context import scope_for_task, describe_route
+
+logger = logging.getLogger(__name__)
+
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() in ("1", "true", "yes")
+# How often the heartbeat runs on the loop
+LOOP_WATCHDOG_INTERVAL_MS = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "50"))
+# A heartbeat this late means something blocked the loop; its stack is captured and logged
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+LOOP_BLOCK_LOG_SIZE = int(os.getenv("LOOP_BLOCK_LOG_SIZE", "100"))
+
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+STACK_LIMIT = 30
+RECENT_BEATS = 20
+
+def _format_stack(frame) -> list:
+    return [
+        f"{entry.filename}:{entry.lineno} in {entry.name}"
+        for entry in traceback.extract_stack(frame, limit=STACK_LIMIT)
+    ]
+
+def _background_label(task):
+    """Route label for work outside a request: the task's coroutine function, never its (per-task) name"""
+    if task is None:
+        return None
+    return f"background {getattr(task.get_coro(), '__qualname__', 'task')}"
+
+class LoopWatchdog:
+    """Measures event-loop lag continuously and catches what blocks the loop.
+
+    A heartbeat task sleeps for a fixed interval and records how late it wakes
+    up. A watchdog thread notices when the heartbeat is overdue by more than
+    the threshold, notes the route of the request whose task is running and
+    samples the loop thread's stack until the block ends. When the heartbeat
+    resumes the block is logged with its most frequent stack and counted per
+    route.
+    """
+
+    def __init__(self, interval_ms: float = LOOP_WATCHDOG_INTERVAL_MS, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._capture = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.beats = 0
+        self._recent = deque(maxlen=RECENT_BEATS)
+        self._buckets = Counter()
+        self._lag_sum_ms = 0.0
+        self._routes = {}
+        self.events = deque(maxlen=LOOP_BLOCK_LOG_SIZE)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the heartbeat on the running loop and the watchdog thread"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = self._loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, self._loop.time() - expected)
+            with self._lock:
+                capture, self._capture = self._capture, None
+                self._last_beat = time.monotonic()
+            self._record_lag(lag * 1000)
+            if lag >= self.threshold:
+                self._record_block(lag * 1000, capture)
+
+    def _watch(self):
+        # Checking several times per threshold catches the block while it is still happening
+        while not self._stop.wait(min(self.interval, self.threshold) / 4):
+            with self._lock:
+                overdue = time.monotonic() - self._last_beat - self.interval
+                if overdue < self.threshold:
+                    continue
+                if self._capture is None:
+                    # The request may be finished by the time the heartbeat resumes, so resolve its route now
+                    task = asyncio.current_task(self._loop)
+                    scope = scope_for_task(task) if task is not None else None
+                    route = describe_route(scope) if scope is not None else _background_label(task)
+                    self._capture = {"route": route, "stacks": Counter()}
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._capture["stacks"][tuple(_format_stack(frame))] += 1
+
+    def _record_lag(self, lag_ms: float):
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.beats += 1
+        self._lag_sum_ms += lag_ms
+        self._recent.append(lag_ms)
+        for bound in LAG_BUCKETS_MS:
+            if lag_ms <= bound:
+                self._buckets[bound] += 1
+                break
+        else:
+            self._buckets["+Inf"] += 1
+
+    def _record_block(self, duration_ms: float, capture):
+        route = None
+        stack = []
+        samples = 0
+        if capture is not None:
+            route = capture["route"]
+            if capture["stacks"]:
+                # The stack seen most often while the loop was stuck is the likeliest culprit
+                stack, samples = capture["stacks"].most_common(1)[0]
+                stack = list(stack)
+        route = route or "unknown"
+
+        stats = self._routes.setdefault(route, {"jumlah": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["jumlah"] += 1
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        self.events.append({
+            "waktu": datetime.now(timezone.utc).isoformat(),
+            "durasi_ms": round(duration_ms, 3),
+            "route": route,
+            "stack": stack,
+            "sampel_stack": samples,
+        })
+        logger.warning("Event loop blocked for %.0f ms in %s\n%s", duration_ms, route, "\n".join(stack) or "(stack not captured)")
+
+    def recent_max_lag_ms(self) -> float:
+        """Highest lag over the last few heartbeats"""
+        return max(self._recent, default=0.0)
+
+    def stats(self) -> dict:
+        return {
+            "berjalan": self.running,
+            "interval_ms": self.interval * 1000,
+            "ambang_ms": self.threshold * 1000,
+            "lag_terakhir_ms": round(self.last_lag_ms, 3),
+            "lag_maks_ms": round(self.max_lag_ms, 3),
+            "lag_rata_rata_ms": round(self._lag_sum_ms / self.beats, 3) if self.beats else 0.0,
+            "per_route": {
+                route: {**stats, "total_ms": round(stats["total_ms"], 3), "max_ms": round(stats["max_ms"], 3)}
+                for route, stats in sorted(self._routes.items(), key=lambda item: -item[1]["total_ms"])
+            },
+            "kejadian": list(reversed(self.events)),
+        }
+
+    def prometheus(self) -> str:
+        """Lag histogram and per-route block counters in the Prometheus text format"""
+        lines = [
+            "# HELP kudakan_event_loop_lag_ms Heartbeat lateness of the event loop",
+            "# TYPE kudakan_event_loop_lag_ms histogram",
+        ]
+        cumulative = 0
+        for bound in LAG_BUCKETS_MS:
+            cumulative += self._buckets[bound]
+            lines.append(f'kudakan_event_loop_lag_ms_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'kudakan_event_loop_lag_ms_bucket{{le="+Inf"}} {self.beats}')
+        lines.append(f"kudakan_event_loop_lag_ms_sum {self._lag_sum_ms:.3f}")
+        lines.append(f"kudakan_event_loop_lag_ms_count {self.beats}")
+        lines.append("# HELP kudakan_event_loop_blocks_total Times the loop was blocked past the threshold, by route")
+        lines.append("# TYPE kudakan_event_loop_blocks_total counter")
+        for route, stats in self._routes.items():
+            lines.append(f'kudakan_event_loop_blocks_total{{route="{_label(route)}"}} {stats["jumlah"]}')
+        lines.append("# HELP kudakan_event_loop_blocked_ms_total Time the loop was blocked past the threshold, by route")
+        lines.append("# TYPE kudakan_event_loop_blocked_ms_total counter")
+        for route, stats in self._routes.items():
+            lines.append(f'kudakan_event_loop_blocked_ms_total{{route="{_label(route)}"}} {stats["total_ms"]:.3f}')
+        return "\n".join(lines) + "\n"
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+loop_watchdog = LoopWatchdog()
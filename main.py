@@ -1,21 +1,86 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
+from fastapi.staticfiles import StaticFiles
+from database import engine, Base, SessionLocal
 from routers import mahasiswa, kantin, menu, pesanan, detail_pesanan
-from supabase_storage import supabase  # import supabase client siap pakai
+from supabase_storage import supabase, STORAGE_BACKEND, LOCAL_STORAGE_DIR, LOCAL_STORAGE_URL  # import supabase client siap pakai
+from responses import ORJSONResponse
+import health
+from compression import CompressionMiddleware
+from profiling import ProfilingMiddleware
+from request_context import RequestContextMiddleware, start_draining
+from shutdown import install_signal_handlers, request_timeout, lifespan_timeout
+from background import register_periodic, start_jobs, stop_jobs
+from popularity import refresh_popularity_job, REFRESH_INTERVAL_SECONDS
+from accounts import sync_revocations, backfill_accounts, REVOCATION_SYNC_SECONDS
+from refresh_tokens import purge_refresh_tokens, REFRESH_PURGE_SECONDS
+from loop_watchdog import loop_watchdog, LOOP_WATCHDOG_ENABLED
+from slow_queries import slow_query_log
+
+logger = logging.getLogger(__name__)
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Login only looks in akun, so users created before it existed are indexed before serving
+with SessionLocal() as _db:
+    backfill_accounts(_db)
+
+def flush_metrics():
+    """Write the process's final counters to the log, which is where they are collected from"""
+    stats = loop_watchdog.stats()
+    logger.info(
+        "Final metrics: event loop max lag %.1f ms, %d blocked route(s), %d slow queries",
+        stats["lag_maks_ms"], len(stats["per_route"]), slow_query_log.total,
+    )
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+async def graceful_shutdown(timeout: float):
+    """Let background jobs finish, write the final metrics and close pool connections.
+
+    Runs after uvicorn has finished (or given up on) open requests. Each step
+    gets whatever is left of the timeout, so this never takes longer than it.
+    """
+    deadline = time.monotonic() + timeout
+
+    def remaining() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    start_draining()
+    await stop_jobs(remaining())
+    await loop_watchdog.stop()
+    flush_metrics()
+    # Connections checked out by unfinished work are closed when they are returned
+    try:
+        await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, engine.dispose), remaining())
+    except asyncio.TimeoutError:
+        logger.warning("Closing database connections did not finish before the shutdown timeout")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    install_signal_handlers()
+    start_jobs()
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    yield
+    await graceful_shutdown(lifespan_timeout())
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Kudakan API",
     description="FastAPI backend for university canteen ordering system with Supabase storage",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -27,16 +92,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON/CSV bodies for clients that accept gzip or brotli
+app.add_middleware(CompressionMiddleware)
+
+# Profile requests on demand (X-Profile: <admin token>) or at PROFILE_SAMPLE_RATE
+app.add_middleware(ProfilingMiddleware)
+
+# Lets the slow-query log and the loop watchdog attribute work to the route that ran it
+app.add_middleware(RequestContextMiddleware)
+
 # Tidak perlu init_minio(), langsung pakai supabase client yang sudah siap
 
 # Include routers
-from routers import auth
+from routers import auth, admin
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(mahasiswa.router, prefix="/api/v1/mahasiswa", tags=["Mahasiswa"])
 app.include_router(kantin.router, prefix="/api/v1/kantin", tags=["Kantin"])
 app.include_router(menu.router, prefix="/api/v1/menu", tags=["Menu"])
 app.include_router(pesanan.router, prefix="/api/v1/pesanan", tags=["Pesanan"])
 app.include_router(detail_pesanan.router, prefix="/api/v1/detail-pesanan", tags=["Detail Pesanan"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
+app.include_router(health.router, tags=["Health"])
+
+# Images stored by the local storage backend are served by the app itself
+if STORAGE_BACKEND == "local":
+    app.mount(LOCAL_STORAGE_URL, StaticFiles(directory=LOCAL_STORAGE_DIR), name="uploads")
+
+# Background jobs
+register_periodic("popularity", REFRESH_INTERVAL_SECONDS, refresh_popularity_job)
+register_periodic("revocations", REVOCATION_SYNC_SECONDS, sync_revocations)
+register_periodic("refresh-purge", REFRESH_PURGE_SECONDS, purge_refresh_tokens)
 
 @app.get("/")
 async def root():
@@ -47,14 +132,12 @@ async def root():
         "redoc": "/redoc"
     }
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
-
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=5000,
-        reload=True
+        reload=True,
+        # Uvicorn's share of SHUTDOWN_TIMEOUT_SECONDS for open requests, before the lifespan shutdown runs
+        timeout_graceful_shutdown=request_timeout()
     )
@@ -0,0 +1,124 @@
+import csv
+import io
+import os
+from typing import List
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from models import Menu
+from schemas import MenuBase
+
+MENU_BULK_MAX_ITEMS = int(os.getenv("MENU_BULK_MAX_ITEMS", "5000"))
+# Names per lookup query, keeping bound parameters under the database limits
+MENU_BULK_CHUNK_SIZE = 1000
+
+CSV_FIELDS = ("nama_menu", "harga", "img_menu", "tipe_menu")
+
+# Column limits, so one oversized row is reported instead of failing the whole batch in the database
+_menu_columns = Menu.__table__.c
+HARGA_PRECISION = _menu_columns.harga.type.precision
+HARGA_SCALE = _menu_columns.harga.type.scale
+NAMA_MENU_MAX_LENGTH = _menu_columns.nama_menu.type.length
+IMG_MENU_MAX_LENGTH = _menu_columns.img_menu.type.length
+
+class BulkFormatError(ValueError):
+    """The request body is not a CSV document or JSON array of menu items"""
+
+def parse_rows(body: bytes, content_type: str) -> List[dict]:
+    """Decode a CSV document (with header) or a JSON array into raw row dicts"""
+    if content_type.startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        except UnicodeDecodeError:
+            raise BulkFormatError("CSV must be UTF-8 encoded")
+        if reader.fieldnames is None or "nama_menu" not in reader.fieldnames:
+            raise BulkFormatError(f"CSV header must include: {', '.join(CSV_FIELDS)}")
+        # Empty cells mean "not given", so schema defaults apply
+        return [{key: value for key, value in row.items() if key in CSV_FIELDS and value not in ("", None)} for row in reader]
+
+    try:
+        rows = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise BulkFormatError("Body must be a JSON array or a CSV document")
+    if not isinstance(rows, list):
+        raise BulkFormatError("Body must be a JSON array of menu items")
+    return rows
+
+def column_errors(item: MenuBase) -> List[str]:
+    """Values that do not fit their menu column"""
+    errors = []
+    if item.harga < 0:
+        errors.append("harga: must not be negative")
+    # Trailing zeros (e.g. 1.500) still fit
+    if -item.harga.normalize().as_tuple().exponent > HARGA_SCALE:
+        errors.append(f"harga: at most {HARGA_SCALE} decimal places")
+    if abs(item.harga) >= 10 ** (HARGA_PRECISION - HARGA_SCALE):
+        errors.append(f"harga: at most {HARGA_PRECISION - HARGA_SCALE} digits before the decimal point")
+    if len(item.nama_menu) > NAMA_MENU_MAX_LENGTH:
+        errors.append(f"nama_menu: at most {NAMA_MENU_MAX_LENGTH} characters")
+    if item.img_menu is not None and len(item.img_menu) > IMG_MENU_MAX_LENGTH:
+        errors.append(f"img_menu: at most {IMG_MENU_MAX_LENGTH} characters")
+    return errors
+
+def validate_rows(rows: List[dict]):
+    """Validate every row and return (valid items by row number, per-row errors)"""
+    items = {}
+    errors = []
+    seen = {}
+    for baris, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"baris": baris, "errors": ["Item must be an object"]})
+            continue
+        try:
+            item = MenuBase.model_validate(row)
+        except ValidationError as exc:
+            errors.append({"baris": baris, "errors": [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            ]})
+            continue
+        invalid = column_errors(item)
+        if invalid:
+            errors.append({"baris": baris, "errors": invalid})
+            continue
+        if item.nama_menu in seen:
+            errors.append({"baris": baris, "errors": [f"nama_menu: duplicate of row {seen[item.nama_menu]}"]})
+            continue
+        seen[item.nama_menu] = baris
+        items[baris] = item
+    return items, errors
+
+def import_menu(db: Session, kantin_id: int, rows: List[dict]) -> dict:
+    """Create or update a kantin's menus by nama_menu in one transaction.
+
+    Existing names are resolved up front, then new items go in as one executemany
+    INSERT (batched by SQLAlchemy into multi-row VALUES statements) and existing
+    ones as one executemany UPDATE by primary key.
+    Invalid rows are reported and skipped.
+    """
+    items, errors = validate_rows(rows)
+
+    existing = {}
+    names = [item.nama_menu for item in items.values()]
+    for start in range(0, len(names), MENU_BULK_CHUNK_SIZE):
+        existing.update(db.query(Menu.nama_menu, Menu.id_menu).filter(
+            Menu.id_kantin == kantin_id, Menu.nama_menu.in_(names[start:start + MENU_BULK_CHUNK_SIZE])
+        ).all())
+
+    new_rows = []
+    changed_rows = []
+    for item in items.values():
+        id_menu = existing.get(item.nama_menu)
+        if id_menu is None:
+            new_rows.append({"id_kantin": kantin_id, **item.model_dump()})
+        else:
+            # Fields left out of the import (e.g. img_menu) keep their current value
+            changed_rows.append({"id_menu": id_menu, **item.model_dump(exclude_unset=True)})
+
+    if new_rows:
+        db.execute(insert(Menu), new_rows)
+    if changed_rows:
+        db.execute(update(Menu), changed_rows)
+    db.commit()
+
+    return {"dibuat": len(new_rows), "diperbarui": len(changed_rows), "gagal": errors}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Text, Numeric, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Enum, ForeignKey, Text, Numeric, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -77,11 +77,16 @@ class Pesanan(Base):
     mahasiswa = relationship("Mahasiswa", back_populates="pesanan")
     detail_pesanan = relationship("DetailPesanan", back_populates="pesanan")
 
+    __table_args__ = (
+        # Order history per kantin, scanned by date range
+        Index("ix_pesanan_kantin_tanggal", "id_kantin", "tanggal"),
+    )
+
 class DetailPesanan(Base):
     __tablename__ = "detail_pesanan"
     
     id_detail = Column(Integer, primary_key=True, index=True)
-    id_pesanan = Column(Integer, ForeignKey("pesanan.id_pesanan"), nullable=False)
+    id_pesanan = Column(Integer, ForeignKey("pesanan.id_pesanan"), nullable=False, index=True)
     id_menu = Column(Integer, ForeignKey("menu.id_menu"), nullable=False)
     jumlah = Column(Integer, nullable=False)
     harga_total = Column(Numeric(10, 2), nullable=False)
@@ -89,3 +94,64 @@ class DetailPesanan(Base):
     # Relationships
     pesanan = relationship("Pesanan", back_populates="detail_pesanan")
     menu = relationship("Menu", back_populates="detail_pesanan")
+
+# Sales rollups, updated incrementally when a pesanan reaches "selesai"
+class RekapPenjualan(Base):
+    __tablename__ = "rekap_penjualan"
+    
+    id_kantin = Column(Integer, ForeignKey("kantin.id_kantin"), primary_key=True)
+    jam = Column(DateTime(timezone=True), primary_key=True)
+    jumlah_pesanan = Column(Integer, nullable=False, default=0)
+    jumlah_item = Column(Integer, nullable=False, default=0)
+    total_pendapatan = Column(Numeric(14, 2), nullable=False, default=0)
+
+class RekapMenu(Base):
+    __tablename__ = "rekap_menu"
+    
+    id_kantin = Column(Integer, ForeignKey("kantin.id_kantin"), primary_key=True)
+    id_menu = Column(Integer, ForeignKey("menu.id_menu"), primary_key=True)
+    tanggal = Column(Date, primary_key=True)
+    jumlah = Column(Integer, nullable=False, default=0)
+    total_pendapatan = Column(Numeric(14, 2), nullable=False, default=0)
+
+# Popularity ranking, refreshed periodically from decayed order counts
+class SkorMenu(Base):
+    __tablename__ = "skor_menu"
+    
+    id_menu = Column(Integer, ForeignKey("menu.id_menu", ondelete="CASCADE"), primary_key=True)
+    skor = Column(Float, nullable=False, default=0)
+    peringkat_kantin = Column(Integer, nullable=False)
+    peringkat_tipe = Column(Integer, nullable=False)
+    diperbarui = Column(DateTime(timezone=True), nullable=False)
+
+# Unified login index over mahasiswa and kantin, kept in sync by accounts.py
+class Akun(Base):
+    __tablename__ = "akun"
+    
+    user_type = Column(String(20), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    email = Column(String(255), nullable=False, unique=True, index=True)
+    password = Column(String(255), nullable=False)
+    # Tokens carrying an older version are rejected; bumped on password change
+    token_version = Column(Integer, nullable=False, default=0)
+    token_revoked_at = Column(DateTime, nullable=True)
+
+# Deleted accounts, kept for one access token lifetime so every worker rejects their tokens
+class AkunDihapus(Base):
+    __tablename__ = "akun_dihapus"
+    
+    user_type = Column(String(20), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    dihapus = Column(DateTime, nullable=False, index=True)
+
+# One row per refresh token family (login session); only the hash of the current token is kept
+class SesiRefresh(Base):
+    __tablename__ = "sesi_refresh"
+    
+    id_sesi = Column(String(32), primary_key=True)
+    user_type = Column(String(20), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    token_version = Column(Integer, nullable=False)
+    token_hash = Column(String(64), nullable=False)
+    kedaluwarsa = Column(DateTime, nullable=False, index=True)
+    dicabut = Column(DateTime, nullable=True)
@@ -0,0 +1,85 @@
+import argparse
+import math
+import os
+import time
+from passlib.context import CryptContext
+
+# Hashing policy. Hashes made under other settings are rehashed on the next successful login.
+# PASSWORD_SCHEME=argon2 needs the optional argon2-cffi package.
+PASSWORD_SCHEME = os.getenv("PASSWORD_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+# Latency budget for one password verification at login
+LOGIN_P99_BUDGET_MS = float(os.getenv("LOGIN_P99_BUDGET_MS", "250"))
+
+SCHEMES = ("bcrypt", "argon2")
+
+def build_context(
+    scheme: str = PASSWORD_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> CryptContext:
+    """Build a CryptContext that hashes with the given scheme and cost.
+
+    Pinning min and max bcrypt rounds to the configured value makes needs_update
+    flag hashes of any other cost, so existing hashes move up or down with the policy.
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unsupported PASSWORD_SCHEME: {scheme}")
+    return CryptContext(
+        schemes=[scheme] + [other for other in SCHEMES if other != scheme],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+def p99_ms(context: CryptContext, samples: int) -> float:
+    """Measure the 99th percentile of one verification under a context"""
+    hashed = context.hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[min(len(timings) - 1, math.ceil(0.99 * len(timings)) - 1)]
+
+def calibrate(scheme: str, target_ms: float, samples: int):
+    """Print p99 verification latency per cost and return the highest cost within target"""
+    if scheme == "bcrypt":
+        candidates = [("BCRYPT_ROUNDS", rounds, build_context("bcrypt", bcrypt_rounds=rounds)) for rounds in range(8, 17)]
+    else:
+        candidates = [("ARGON2_TIME_COST", cost, build_context("argon2", argon2_time_cost=cost)) for cost in range(1, 11)]
+
+    chosen = None
+    for setting, value, context in candidates:
+        latency = p99_ms(context, samples)
+        within = latency <= target_ms
+        print(f"{setting}={value:<3} p99={latency:8.1f} ms {'ok' if within else 'over budget'}")
+        if not within:
+            break
+        chosen = (setting, value)
+    return chosen
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick a password hashing cost for a target login latency on this machine")
+    parser.add_argument("command", choices=["calibrate"])
+    parser.add_argument("--scheme", choices=SCHEMES, default=PASSWORD_SCHEME)
+    parser.add_argument("--target-ms", type=float, default=LOGIN_P99_BUDGET_MS)
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args()
+
+    chosen = calibrate(args.scheme, args.target_ms, args.samples)
+    if chosen is None:
+        print(f"No {args.scheme} cost verifies within {args.target_ms} ms at p99")
+    else:
+        print(f"\nPASSWORD_SCHEME={args.scheme}\n{chosen[0]}={chosen[1]}")
@@ -0,0 +1,67 @@
+import math
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import Date, func
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Pesanan, DetailPesanan, Menu, SkorMenu
+
+# An order counts half as much after this many days
+HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+# Orders older than this many half-lives weigh under 1/256 and are ignored
+WINDOW_HALF_LIVES = 8
+REFRESH_INTERVAL_SECONDS = int(os.getenv("POPULARITY_REFRESH_SECONDS", "600"))
+
+def decay(age_days: float) -> float:
+    """Weight of an order placed age_days ago"""
+    return math.pow(0.5, max(age_days, 0) / HALF_LIFE_DAYS)
+
+def refresh_popularity(db: Session, now: Optional[datetime] = None) -> int:
+    """Recompute decayed popularity scores and per-kantin/per-tipe ranks for every menu"""
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    cutoff = now - timedelta(days=HALF_LIFE_DAYS * WINDOW_HALF_LIVES)
+
+    day = func.date(Pesanan.tanggal, type_=Date)
+    counts = db.query(
+        DetailPesanan.id_menu, day.label("hari"), func.sum(DetailPesanan.jumlah).label("jumlah")
+    ).join(Pesanan, Pesanan.id_pesanan == DetailPesanan.id_pesanan).filter(
+        Pesanan.tanggal >= cutoff
+    ).group_by(DetailPesanan.id_menu, day).all()
+
+    scores = defaultdict(float)
+    for row in counts:
+        scores[row.id_menu] += row.jumlah * decay((today - row.hari).days)
+
+    # Rank every menu, including ones without recent orders, within its kantin and its tipe
+    menus = db.query(Menu.id_menu, Menu.id_kantin, Menu.tipe_menu).all()
+    ranked = sorted(menus, key=lambda menu: (-scores[menu.id_menu], menu.id_menu))
+    per_kantin = defaultdict(int)
+    per_tipe = defaultdict(int)
+    rows = []
+    for menu in ranked:
+        per_kantin[menu.id_kantin] += 1
+        per_tipe[menu.tipe_menu] += 1
+        rows.append({
+            "id_menu": menu.id_menu,
+            "skor": scores[menu.id_menu],
+            "peringkat_kantin": per_kantin[menu.id_kantin],
+            "peringkat_tipe": per_tipe[menu.tipe_menu],
+            "diperbarui": now,
+        })
+
+    # Swap the whole ranking in one transaction so readers never see a partial one
+    db.query(SkorMenu).delete(synchronize_session=False)
+    db.bulk_insert_mappings(SkorMenu, rows)
+    db.commit()
+    return len(rows)
+
+def refresh_popularity_job():
+    """Periodic job entry point with its own session"""
+    db = SessionLocal()
+    try:
+        refresh_popularity(db)
+    finally:
+        db.close()
@@ -0,0 +1,238 @@
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from sqlalchemy import event
+from starlette.datastructures import Headers, MutableHeaders
+from auth import ADMIN_TOKEN
+from database import engine
+from request_context import route_path
+
+# Fraction of requests profiled without being asked; 0 profiles only requests sending the header
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Number of profiles kept; the oldest is dropped first
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# Requests sending the admin token in this header are profiled
+PROFILE_HEADER = "x-profile"
+
+PROFILE_MAX_DEPTH = 128
+PROFILE_MAX_QUERIES = 500
+STATEMENT_MAX_LENGTH = 500
+
+_active_profile: ContextVar = ContextVar("active_profile", default=None)
+
+def _short_path(filename: str) -> str:
+    """Repository-relative path for app code, package-relative for installed libraries"""
+    if filename.startswith("<"):
+        return filename
+    _, marker, package_path = filename.rpartition("site-packages" + os.sep)
+    return package_path if marker else os.path.relpath(filename)
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    filename = _short_path(code.co_filename)
+    # Semicolons separate frames in the folded format
+    return f"{code.co_name} ({filename}:{frame.f_lineno})".replace(";", ":")
+
+def _stack(frame) -> tuple:
+    """Frame names from the outermost caller to the given frame"""
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return tuple(reversed(names))
+
+def _await_stack(coro) -> tuple:
+    """Frame names along the chain of coroutines a suspended task is awaiting, outermost first"""
+    names = []
+    while coro is not None and len(names) < PROFILE_MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        names.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(names)
+
+class RequestProfile:
+    """Wall-clock samples and SQL timeline of one request.
+
+    A sampler thread looks at the event loop thread every interval. While the
+    request's task is running its Python stack is recorded; while the task is
+    suspended, the coroutine chain it is awaiting in is recorded under an
+    "[awaiting]" leaf, so time spent on I/O or in the threadpool is visible too.
+    Other requests running on the loop are not counted.
+    """
+
+    def __init__(self, scope, reason: str, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = scope.get("method", "")
+        self.path = scope.get("path", "")
+        self.reason = reason
+        self.interval = interval
+        self.started = datetime.now(timezone.utc)
+        self.samples = Counter()
+        self.queries = []
+        self.dropped_queries = 0
+        self.route = None
+        self.status = None
+        self.duration_ms = None
+        self._store = None
+        self._start = time.perf_counter()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def finish(self, scope, status, store):
+        """Stop sampling; the sampler thread adds the profile to store once its last sample is taken.
+
+        Joining the thread here would block the event loop for up to one interval.
+        """
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.route = route_path(scope)
+        self.status = status
+        self._store = store
+        self._stop.set()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            if asyncio.current_task(self._loop) is self._task:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    self.samples[_stack(frame)] += 1
+            elif not self._task.done():
+                stack = _await_stack(self._task.get_coro())
+                if stack:
+                    self.samples[stack + ("[awaiting]",)] += 1
+        self._store.add(self)
+
+    def add_query(self, statement: str, started: float, duration: float):
+        if len(self.queries) >= PROFILE_MAX_QUERIES:
+            self.dropped_queries += 1
+            return
+        self.queries.append({
+            "mulai_ms": round((started - self._start) * 1000, 3),
+            "durasi_ms": round(duration * 1000, 3),
+            "statement": statement[:STATEMENT_MAX_LENGTH],
+        })
+
+    def folded(self) -> str:
+        """Samples in the collapsed-stack format read by flamegraph.pl, speedscope and similar tools"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "alasan": self.reason,
+            "dimulai": self.started.isoformat(),
+            "durasi_ms": round(self.duration_ms, 3),
+            "jumlah_sampel": sum(self.samples.values()),
+            "jumlah_query": len(self.queries) + self.dropped_queries,
+            "durasi_query_ms": round(sum(query["durasi_ms"] for query in self.queries), 3),
+        }
+
+    def detail(self) -> dict:
+        return {
+            **self.summary(),
+            "interval_ms": self.interval * 1000,
+            "query": self.queries,
+            "query_tidak_dicatat": self.dropped_queries,
+        }
+
+class ProfileStore:
+    """Ring buffer of finished profiles"""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+profile_store = ProfileStore()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile.get() is not None:
+        context.profile_query_start = time.perf_counter()
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    started = getattr(context, "profile_query_start", None)
+    if profile is not None and started is not None:
+        profile.add_query(statement, started, time.perf_counter() - started)
+
+def profile_reason(headers: Headers):
+    """Why a request should be profiled, or None"""
+    token = headers.get(PROFILE_HEADER)
+    if token is not None and ADMIN_TOKEN and hmac.compare_digest(token, ADMIN_TOKEN):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampel"
+    return None
+
+class ProfilingMiddleware:
+    """Profile requests that send the admin token in X-Profile, plus a random sample of the rest.
+
+    Profiled responses carry an X-Profile-Id header naming the stored profile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reason = profile_reason(Headers(scope=scope))
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope, reason)
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile.id
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _active_profile.reset(token)
+            profile.finish(scope, status, profile_store)
@@ -0,0 +1,87 @@
+import abc
+import importlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from auth_schemas import LoginRequest
+
+# Login attempts: burst size and sustained attempts per minute
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", "20"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "10"))
+LOGIN_EMAIL_BURST = int(os.getenv("LOGIN_EMAIL_BURST", "5"))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "5"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Only trust X-Forwarded-For when running behind a known proxy
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+class BucketStore(abc.ABC):
+    """Token bucket storage backend.
+
+    Subclass this to share buckets between workers (e.g. in Redis) and point
+    RATE_LIMIT_STORE at it as "module:ClassName".
+    """
+
+    @abc.abstractmethod
+    def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> float:
+        """Take one token; return 0 if allowed, otherwise seconds until a token is available"""
+
+class InMemoryBucketStore(BucketStore):
+    """Per-process token buckets, bounded by evicting the least recently used keys"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> float:
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+def load_store() -> BucketStore:
+    """Build the store named by RATE_LIMIT_STORE, defaulting to in-memory buckets"""
+    path = os.getenv("RATE_LIMIT_STORE")
+    if not path:
+        return InMemoryBucketStore()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+store = load_store()
+
+def client_ip(request: Request) -> str:
+    """Best-effort client address for rate limiting"""
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _reject(retry_after: float):
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts. Please try again later.",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+def login_rate_limit(request: Request, login_data: LoginRequest) -> None:
+    """Throttle login attempts per client IP and per email before any DB or bcrypt work"""
+    now = time.time()
+    retry_after = store.take(f"login:ip:{client_ip(request)}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60, now)
+    if retry_after:
+        _reject(retry_after)
+    retry_after = store.take(f"login:email:{login_data.email.lower()}", LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE / 60, now)
+    if retry_after:
+        _reject(retry_after)
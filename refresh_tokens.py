@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Akun, SesiRefresh
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Revoked sessions are kept until they expire, then removed by the purge job
+REFRESH_PURGE_SECONDS = int(os.getenv("REFRESH_PURGE_SECONDS", "3600"))
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _new_token(id_sesi: str) -> str:
+    return f"{id_sesi}.{secrets.token_urlsafe(32)}"
+
+def _invalid(detail: str = "Invalid refresh token"):
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def issue_refresh_token(db: Session, akun: Akun) -> str:
+    """Start a new refresh token family for a successful login; the caller commits"""
+    id_sesi = secrets.token_hex(16)
+    token = _new_token(id_sesi)
+    db.add(SesiRefresh(
+        id_sesi=id_sesi,
+        user_type=akun.user_type,
+        user_id=akun.user_id,
+        token_version=akun.token_version,
+        token_hash=_hash(token),
+        kedaluwarsa=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[Akun, str]:
+    """Exchange a refresh token for the account and the next token of its family.
+
+    Presenting a token that was already rotated means it leaked (or a client
+    replayed it), so the whole family is revoked and its holder must log in again.
+    """
+    id_sesi, _, _ = token.partition(".")
+    sesi = db.get(SesiRefresh, id_sesi) if id_sesi else None
+    if sesi is None or sesi.dicabut is not None or sesi.kedaluwarsa <= datetime.utcnow():
+        _invalid()
+
+    old_hash = _hash(token)
+    if not hmac.compare_digest(old_hash, sesi.token_hash):
+        revoke_session(db, id_sesi)
+        db.commit()
+        _invalid("Refresh token reuse detected. Please login again.")
+
+    # Tokens from before a password change or account deletion are no longer honoured
+    akun = db.query(Akun).filter(Akun.user_type == sesi.user_type, Akun.user_id == sesi.user_id).first()
+    if akun is None or akun.token_version != sesi.token_version:
+        revoke_session(db, id_sesi)
+        db.commit()
+        _invalid()
+
+    new_token = _new_token(id_sesi)
+    # Conditional on the old hash so two concurrent refreshes cannot both rotate
+    rotated = db.query(SesiRefresh).filter(
+        SesiRefresh.id_sesi == id_sesi, SesiRefresh.token_hash == old_hash
+    ).update({SesiRefresh.token_hash: _hash(new_token)}, synchronize_session=False)
+    if not rotated:
+        revoke_session(db, id_sesi)
+        db.commit()
+        _invalid("Refresh token reuse detected. Please login again.")
+    db.commit()
+    return akun, new_token
+
+def revoke_session(db: Session, id_sesi: str):
+    """Revoke a refresh token family; the caller commits"""
+    db.query(SesiRefresh).filter(SesiRefresh.id_sesi == id_sesi, SesiRefresh.dicabut.is_(None)).update(
+        {SesiRefresh.dicabut: datetime.utcnow()}, synchronize_session=False
+    )
+
+def revoke_refresh_token(db: Session, token: str):
+    """Log out the session a refresh token belongs to, if the token is current"""
+    id_sesi, _, _ = token.partition(".")
+    sesi = db.get(SesiRefresh, id_sesi) if id_sesi else None
+    if sesi is not None and hmac.compare_digest(_hash(token), sesi.token_hash):
+        revoke_session(db, id_sesi)
+        db.commit()
+
+def purge_refresh_tokens():
+    """Delete expired families and revoked ones that could no longer be used anyway"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(SesiRefresh).filter(or_(
+            SesiRefresh.kedaluwarsa <= now,
+            SesiRefresh.dicabut <= now - timedelta(days=1),
+        )).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Mount
+
+# ASGI scope of the request being handled; copied into threadpool calls along with the rest of the context
+current_scope: ContextVar = ContextVar("current_scope", default=None)
+
+# Scope of the request each task is serving, for code that looks at the loop from another thread
+_task_scopes = {}
+# When shutdown began (time.monotonic()); requests are still served, but the instance reports not ready
+_draining_since = None
+
+def route_path(scope) -> str:
+    """The matched route template (e.g. /api/v1/menu/{menu_id}), the mount a file was served from
+    (e.g. /uploads/{path}), or the raw path before routing"""
+    path = scope.get("path", "")
+    route = scope.get("route")
+    if isinstance(route, Mount):
+        return f"{route.path}/{{path}}"
+    if route is None:
+        # Mounted apps (e.g. StaticFiles) extend root_path with their mount path
+        mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")):]
+        return f"{mount}/{{path}}" if mount else path
+    template = getattr(route, "path", None)
+    regex = getattr(route, "path_regex", None)
+    if not template or regex is None:
+        return path
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    # Routes of included routers may only carry their own part of the path; the prefix is what precedes the part they match
+    for i, char in enumerate(path):
+        if char == "/" and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+def describe_route(scope) -> str:
+    return f"{scope.get('method', '')} {route_path(scope)}"
+
+def current_route():
+    """Route of the request being handled, or None outside a request (e.g. background jobs)"""
+    scope = current_scope.get()
+    return None if scope is None else describe_route(scope)
+
+def scope_for_task(task):
+    """Scope of the request a task is serving, or None"""
+    return _task_scopes.get(task)
+
+def start_draining():
+    """Mark the instance as shutting down: readiness fails and responses close their connection"""
+    global _draining_since
+    if _draining_since is None:
+        _draining_since = time.monotonic()
+
+def is_draining() -> bool:
+    return _draining_since is not None
+
+def draining_since():
+    return _draining_since
+
+class RequestContextMiddleware:
+    """Track in-flight requests and make the current request's scope available to code without access
+    to the request, like engine events. Once draining, responses ask clients to reconnect (to another
+    instance) with Connection: close.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        task = asyncio.current_task()
+        _task_scopes[task] = scope
+
+        async def send_closing(message):
+            if message["type"] == "http.response.start" and _draining_since is not None:
+                MutableHeaders(scope=message)["Connection"] = "close"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_closing)
+        finally:
+            _task_scopes.pop(task, None)
+            current_scope.reset(token)
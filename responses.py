@@ -0,0 +1,28 @@
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse
+
+def _default(obj):
+    """Serialize values orjson does not handle natively, matching Pydantic's JSON output"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content) -> bytes:
+    """Serialize content to JSON bytes with orjson"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the standard json module"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def schema_columns(model, schema):
+    """Mapped columns of a model that a response schema serializes, in schema field order"""
+    table_columns = model.__table__.columns
+    return tuple(getattr(model, name) for name in schema.model_fields if name in table_columns)
+
+def rows_response(rows, status_code: int = 200) -> ORJSONResponse:
+    """Serialize column rows straight to JSON, skipping ORM hydration and response_model validation"""
+    return ORJSONResponse([row._asdict() for row in rows], status_code=status_code)
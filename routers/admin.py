@@ -0,0 +1,65 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from auth import require_admin
+from singleflight import catalog_flight
+from profiling import profile_store
+from slow_queries import slow_query_log, SLOW_QUERY_MS
+from loop_watchdog import loop_watchdog
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/singleflight", response_model=dict)
+async def get_singleflight_stats():
+    """Get how many catalog reads were executed, coalesced or timed out"""
+    return catalog_flight.stats()
+
+def get_profile_or_404(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile
+
+@router.get("/profiles", response_model=list)
+async def get_profiles():
+    """List stored request profiles, newest first"""
+    return [profile.summary() for profile in profile_store.list()]
+
+@router.get("/profiles/{profile_id}", response_model=dict)
+async def get_profile(profile_id: str):
+    """Get a request profile with its SQL timeline"""
+    return get_profile_or_404(profile_id).detail()
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def get_profile_folded(profile_id: str):
+    """Get a request profile's samples as collapsed stacks, e.g. for flamegraph.pl or speedscope"""
+    return get_profile_or_404(profile_id).folded()
+
+@router.delete("/profiles", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_profiles():
+    """Drop all stored request profiles"""
+    profile_store.clear()
+
+@router.get("/slow-queries", response_model=dict)
+async def get_slow_queries(route: Optional[str] = None):
+    """Get logged slow statements, newest first, optionally for one route (e.g. "GET /api/v1/menu/search")"""
+    return {
+        "ambang_ms": SLOW_QUERY_MS,
+        "jumlah_total": slow_query_log.total,
+        "query": slow_query_log.entries(route),
+    }
+
+@router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    """Drop all logged slow statements"""
+    slow_query_log.clear()
+
+@router.get("/event-loop", response_model=dict)
+async def get_event_loop_stats():
+    """Get event-loop lag, blocking time per route and the latest blocking stacks"""
+    return loop_watchdog.stats()
+
+@router.get("/event-loop/metrics", response_class=PlainTextResponse)
+async def get_event_loop_metrics():
+    """Get event-loop lag and blocking counters in the Prometheus text format"""
+    return loop_watchdog.prometheus()
@@ -4,57 +4,61 @@ from sqlalchemy.orm import Session
 from typing import Union
 from datetime import timedelta
 from database import get_db
-from models import Mahasiswa, Kantin
+from models import Mahasiswa, Kantin, Akun
 from schemas import MahasiswaResponse, KantinResponse
-from auth_schemas import LoginRequest, TokenResponse, ChangePasswordRequest
+from auth_schemas import LoginRequest, TokenResponse, ChangePasswordRequest, RefreshRequest, RefreshResponse
 from auth import (
-    verify_password, get_password_hash, create_access_token, 
+    verify_password, verify_and_update_password, get_password_hash, create_user_token, 
     get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from accounts import revoke_user_tokens, USER_MODELS
+from refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from ratelimit import login_rate_limit
 
 router = APIRouter()
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(login_rate_limit)])
 async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     """Login for both mahasiswa and kantin"""
     
-    # Try to find user in mahasiswa table
-    mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.email == login_data.email).first()
-    if mahasiswa and verify_password(login_data.password, mahasiswa.password):
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": mahasiswa.id_mahasiswa, "user_type": "mahasiswa"},
-            expires_delta=access_token_expires
-        )
-        return TokenResponse(
-            access_token=access_token,
-            token_type="bearer",
-            user_type="mahasiswa",
-            user_info={
-                "id": mahasiswa.id_mahasiswa,
-                "nama": mahasiswa.nama,
-                "email": mahasiswa.email,
-                "nim": mahasiswa.nim
+    # One indexed lookup resolves the email to its account, so at most one bcrypt verification runs
+    akun = db.query(Akun).filter(Akun.email == login_data.email).first()
+    valid, new_hash = verify_and_update_password(login_data.password, akun.password) if akun else (False, None)
+    if valid:
+        if akun.user_type == "mahasiswa":
+            user = db.get(Mahasiswa, akun.user_id)
+            user_info = {
+                "id": user.id_mahasiswa,
+                "nama": user.nama,
+                "email": user.email,
+                "nim": user.nim
             }
-        )
-    
-    # Try to find user in kantin table
-    kantin = db.query(Kantin).filter(Kantin.email == login_data.email).first()
-    if kantin and verify_password(login_data.password, kantin.password):
+        else:
+            user = db.get(Kantin, akun.user_id)
+            user_info = {
+                "id": user.id_kantin,
+                "nama_kantin": user.nama_kantin,
+                "email": user.email
+            }
+        
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": kantin.id_kantin, "user_type": "kantin"},
+        access_token = create_user_token(
+            akun.user_type, akun.user_id, user.is_profile_complete, akun.token_version,
             expires_delta=access_token_expires
         )
+        
+        # Move the stored hash to the current cost policy (the akun index follows via its mapper events)
+        if new_hash:
+            user.password = new_hash
+        refresh_token = issue_refresh_token(db, akun)
+        db.commit()
+        
         return TokenResponse(
             access_token=access_token,
             token_type="bearer",
-            user_type="kantin",
-            user_info={
-                "id": kantin.id_kantin,
-                "nama_kantin": kantin.nama_kantin,
-                "email": kantin.email
-            }
+            user_type=akun.user_type,
+            user_info=user_info,
+            refresh_token=refresh_token
         )
     
     # If no user found or password incorrect
@@ -63,6 +67,25 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         detail="Incorrect email or password"
     )
 
+@router.post("/refresh", response_model=RefreshResponse)
+async def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
+    """Issue a new access token and rotate the refresh token, without a password check"""
+    akun, refresh_token = rotate_refresh_token(db, refresh_data.refresh_token)
+    model, id_attr = USER_MODELS[akun.user_type]
+    is_profile_complete = db.query(model.is_profile_complete).filter(getattr(model, id_attr) == akun.user_id).scalar()
+    
+    access_token = create_user_token(
+        akun.user_type, akun.user_id, is_profile_complete, akun.token_version,
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return RefreshResponse(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
+    """Revoke the session of a refresh token"""
+    revoke_refresh_token(db, refresh_data.refresh_token)
+    return None
+
 @router.get("/me")
 async def get_current_user_info(current_user: Union[Mahasiswa, Kantin] = Depends(get_current_user)):
     """Get current user information"""
@@ -93,6 +116,13 @@ async def change_password(
     
     # Update password
     current_user.password = get_password_hash(password_data.new_password)
+    db.flush()
+    
+    # Sign out every session holding a token issued before the change
+    if isinstance(current_user, Mahasiswa):
+        revoke_user_tokens(db, "mahasiswa", current_user.id_mahasiswa)
+    else:
+        revoke_user_tokens(db, "kantin", current_user.id_kantin)
     db.commit()
     
     return {"message": "Password updated successfully"}
@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Optional
 from decimal import Decimal
 from database import get_db
 from models import DetailPesanan, Pesanan, Menu, Mahasiswa, Kantin
 from schemas import DetailPesananCreate, DetailPesananUpdate, DetailPesananResponse
-from auth import get_current_mahasiswa, get_current_kantin, get_current_user, get_current_mahasiswa_with_profile
+from auth import get_current_mahasiswa, get_current_kantin, get_current_principal, get_current_mahasiswa_with_profile
+from responses import rows_response, ORJSONResponse
+from analytics import rollup_update
+from idempotency import idempotent
+from fields import field_selection, select_columns, prune
 
 router = APIRouter()
 
+detail_pesanan_fields = field_selection(DetailPesananResponse)
+
 @router.post("/", response_model=DetailPesananResponse, status_code=status.HTTP_201_CREATED)
-async def create_detail_pesanan(detail: DetailPesananCreate, db: Session = Depends(get_db), current_mahasiswa: Mahasiswa = Depends(get_current_mahasiswa_with_profile)):
+async def create_detail_pesanan(
+    detail: DetailPesananCreate,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_mahasiswa: Mahasiswa = Depends(get_current_mahasiswa_with_profile)
+):
     """Create a new detail pesanan"""
     # Check if pesanan exists
     pesanan = db.query(Pesanan).filter(Pesanan.id_pesanan == detail.id_pesanan).first()
@@ -37,24 +48,33 @@ async def create_detail_pesanan(detail: DetailPesananCreate, db: Session = Depen
             detail=f"Harga total tidak sesuai. Expected: {expected_total}, Got: {detail.harga_total}"
         )
     
-    db_detail = DetailPesanan(
-        id_pesanan=detail.id_pesanan,
-        id_menu=detail.id_menu,
-        jumlah=detail.jumlah,
-        harga_total=detail.harga_total
-    )
+    def create():
+        db_detail = DetailPesanan(
+            id_pesanan=detail.id_pesanan,
+            id_menu=detail.id_menu,
+            jumlah=detail.jumlah,
+            harga_total=detail.harga_total
+        )
     
-    db.add(db_detail)
-    db.commit()
-    db.refresh(db_detail)
+        with rollup_update(db, pesanan):
+            db.add(db_detail)
+        db.commit()
+        db.refresh(db_detail)
+    
+        return db_detail
     
-    return db_detail
+    # Retries with the same Idempotency-Key replay the first response
+    return await idempotent(
+        idempotency_key, f"detail-pesanan:{current_mahasiswa.id_mahasiswa}", detail,
+        DetailPesananResponse, create, status.HTTP_201_CREATED
+    )
 
 @router.post("/auto-calculate", response_model=DetailPesananResponse, status_code=status.HTTP_201_CREATED)
 async def create_detail_pesanan_auto_calculate(
     id_pesanan: int,
     id_menu: int,
     jumlah: int,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_mahasiswa: Mahasiswa = Depends(get_current_mahasiswa_with_profile)
 ):
@@ -79,62 +99,71 @@ async def create_detail_pesanan_auto_calculate(
     # Calculate total price
     harga_total = menu.harga * jumlah
     
-    db_detail = DetailPesanan(
-        id_pesanan=id_pesanan,
-        id_menu=id_menu,
-        jumlah=jumlah,
-        harga_total=harga_total
-    )
+    def create():
+        db_detail = DetailPesanan(
+            id_pesanan=id_pesanan,
+            id_menu=id_menu,
+            jumlah=jumlah,
+            harga_total=harga_total
+        )
     
-    db.add(db_detail)
-    db.commit()
-    db.refresh(db_detail)
+        with rollup_update(db, pesanan):
+            db.add(db_detail)
+        db.commit()
+        db.refresh(db_detail)
     
-    return db_detail
+        return db_detail
+    
+    # Retries with the same Idempotency-Key replay the first response
+    return await idempotent(
+        idempotency_key, f"detail-pesanan-auto:{current_mahasiswa.id_mahasiswa}", {"id_pesanan": id_pesanan, "id_menu": id_menu, "jumlah": jumlah},
+        DetailPesananResponse, create, status.HTTP_201_CREATED
+    )
 
 @router.get("/", response_model=List[DetailPesananResponse])
-async def get_all_detail_pesanan(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_all_detail_pesanan(skip: int = 0, limit: int = 100, fields: dict = Depends(detail_pesanan_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get all detail pesanan with pagination"""
-    if isinstance(current_user, Mahasiswa):
+    columns = select_columns(DetailPesanan, fields)
+    if current_user.is_mahasiswa:
         # Mahasiswa can only see their own detail pesanan
-        details = db.query(DetailPesanan).join(Pesanan).filter(
+        details = db.query(*columns).join(Pesanan).filter(
             Pesanan.id_mahasiswa == current_user.id_mahasiswa
-        ).offset(skip).limit(limit).all()
-    elif isinstance(current_user, Kantin):
+        ).order_by(DetailPesanan.id_detail).offset(skip).limit(limit).all()
+    elif current_user.is_kantin:
         # Kantin can only see detail pesanan for their kantin
-        details = db.query(DetailPesanan).join(Pesanan).filter(
+        details = db.query(*columns).join(Pesanan).filter(
             Pesanan.id_kantin == current_user.id_kantin
-        ).offset(skip).limit(limit).all()
+        ).order_by(DetailPesanan.id_detail).offset(skip).limit(limit).all()
     
-    return details
+    return rows_response(details)
 
 @router.get("/{detail_id}", response_model=DetailPesananResponse)
-async def get_detail_pesanan(detail_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_detail_pesanan(detail_id: int, fields: dict = Depends(detail_pesanan_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get detail pesanan by ID"""
-    detail = db.query(DetailPesanan).options(joinedload(DetailPesanan.pesanan)).filter(
+    detail = db.query(*select_columns(DetailPesanan, fields), Pesanan.id_mahasiswa, Pesanan.id_kantin).join(Pesanan).filter(
         DetailPesanan.id_detail == detail_id
     ).first()
     if detail is None:
         raise HTTPException(status_code=404, detail="Detail pesanan not found")
     
     # Check access permissions
-    if isinstance(current_user, Mahasiswa):
-        if detail.pesanan.id_mahasiswa != current_user.id_mahasiswa:
+    if current_user.is_mahasiswa:
+        if detail.id_mahasiswa != current_user.id_mahasiswa:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view your own detail pesanan"
             )
-    elif isinstance(current_user, Kantin):
-        if detail.pesanan.id_kantin != current_user.id_kantin:
+    elif current_user.is_kantin:
+        if detail.id_kantin != current_user.id_kantin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view detail pesanan for your kantin"
             )
     
-    return detail
+    return ORJSONResponse(prune(detail._asdict(), fields))
 
 @router.get("/pesanan/{pesanan_id}", response_model=List[DetailPesananResponse])
-async def get_detail_by_pesanan(pesanan_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_detail_by_pesanan(pesanan_id: int, fields: dict = Depends(detail_pesanan_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get all detail pesanan for a specific pesanan"""
     # Check if pesanan exists
     pesanan = db.query(Pesanan).filter(Pesanan.id_pesanan == pesanan_id).first()
@@ -142,21 +171,21 @@ async def get_detail_by_pesanan(pesanan_id: int, db: Session = Depends(get_db),
         raise HTTPException(status_code=404, detail="Pesanan not found")
     
     # Check access permissions
-    if isinstance(current_user, Mahasiswa):
+    if current_user.is_mahasiswa:
         if pesanan.id_mahasiswa != current_user.id_mahasiswa:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view details for your own pesanan"
             )
-    elif isinstance(current_user, Kantin):
+    elif current_user.is_kantin:
         if pesanan.id_kantin != current_user.id_kantin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view details for pesanan in your kantin"
             )
     
-    details = db.query(DetailPesanan).filter(DetailPesanan.id_pesanan == pesanan_id).all()
-    return details
+    details = db.query(*select_columns(DetailPesanan, fields)).filter(DetailPesanan.id_pesanan == pesanan_id).all()
+    return rows_response(details)
 
 @router.put("/{detail_id}", response_model=DetailPesananResponse)
 async def update_detail_pesanan(
@@ -188,8 +217,9 @@ async def update_detail_pesanan(
         if menu:
             update_data["harga_total"] = menu.harga * update_data["jumlah"]
     
-    for field, value in update_data.items():
-        setattr(detail, field, value)
+    with rollup_update(db, detail.pesanan):
+        for field, value in update_data.items():
+            setattr(detail, field, value)
     
     db.commit()
     db.refresh(detail)
@@ -212,13 +242,14 @@ async def delete_detail_pesanan(detail_id: int, db: Session = Depends(get_db), c
             detail="You can only delete your own detail pesanan"
         )
     
-    db.delete(detail)
+    with rollup_update(db, detail.pesanan):
+        db.delete(detail)
     db.commit()
     
     return None
 
 @router.get("/pesanan/{pesanan_id}/total", response_model=dict)
-async def get_pesanan_total(pesanan_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_pesanan_total(pesanan_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get total amount for a pesanan"""
     # Check if pesanan exists
     pesanan = db.query(Pesanan).filter(Pesanan.id_pesanan == pesanan_id).first()
@@ -226,13 +257,13 @@ async def get_pesanan_total(pesanan_id: int, db: Session = Depends(get_db), curr
         raise HTTPException(status_code=404, detail="Pesanan not found")
     
     # Check access permissions
-    if isinstance(current_user, Mahasiswa):
+    if current_user.is_mahasiswa:
         if pesanan.id_mahasiswa != current_user.id_mahasiswa:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view totals for your own pesanan"
             )
-    elif isinstance(current_user, Kantin):
+    elif current_user.is_kantin:
         if pesanan.id_kantin != current_user.id_kantin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -240,7 +271,7 @@ async def get_pesanan_total(pesanan_id: int, db: Session = Depends(get_db), curr
             )
     
     # Calculate total
-    details = db.query(DetailPesanan).filter(DetailPesanan.id_pesanan == pesanan_id).all()
+    details = db.query(DetailPesanan.harga_total, DetailPesanan.jumlah).filter(DetailPesanan.id_pesanan == pesanan_id).all()
     total_amount = sum(detail.harga_total for detail in details)
     total_items = sum(detail.jumlah for detail in details)
     
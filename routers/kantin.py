@@ -1,19 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from models import Kantin
-from schemas import KantinCreate, KantinUpdate, KantinResponse, KantinWithMenus, KantinProfileUpdate
-from auth import get_password_hash, get_current_kantin, get_current_user
+from typing import List, Optional
+from datetime import datetime, date, timedelta
+from database import get_db, SessionLocal
+from models import Kantin, Menu
+from schemas import KantinCreate, KantinUpdate, KantinResponse, KantinWithMenus, KantinProfileUpdate, KantinAnalytics
+from auth import get_password_hash, get_current_kantin, get_current_principal, revoke_tokens, ACCOUNT_DELETED
+from accounts import email_registered, commit_user, revoke_user_tokens
+from responses import rows_response, dumps, ORJSONResponse
+from export import stream_ndjson, stream_csv
+from analytics import get_kantin_analytics
+from singleflight import catalog_flight
+from compression import precompressed_response
+from fields import field_selection, full_selection, select_columns, prune, selection_key
 
 router = APIRouter()
 
+kantin_fields = field_selection(KantinResponse)
+
+def load_kantin_with_menus(kantin_id: int, fields: Optional[dict] = None) -> Optional[bytes]:
+    """Load and encode a kantin with its menus, or None if it does not exist"""
+    fields = fields or full_selection(KantinWithMenus)
+    db = SessionLocal()
+    try:
+        kantin = db.query(*select_columns(Kantin, fields, "id_kantin")).filter(Kantin.id_kantin == kantin_id).first()
+        if kantin is None:
+            return None
+        result = prune(kantin._asdict(), fields)
+        # Menus are only queried when selected, and only their selected columns
+        if "menu" in fields:
+            menu = db.query(*select_columns(Menu, fields["menu"])).filter(Menu.id_kantin == kantin_id).all()
+            result["menu"] = [row._asdict() for row in menu]
+        return dumps(result)
+    finally:
+        db.close()
+
 @router.post("/", response_model=KantinResponse, status_code=status.HTTP_201_CREATED)
 async def create_kantin(kantin: KantinCreate, db: Session = Depends(get_db)):
     """Create a new kantin"""
-    # Check if email already exists
-    db_kantin = db.query(Kantin).filter(Kantin.email == kantin.email).first()
-    if db_kantin:
+    # Check if email already exists for any mahasiswa or kantin
+    if email_registered(db, kantin.email):
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
@@ -28,32 +55,85 @@ async def create_kantin(kantin: KantinCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_kantin)
-    db.commit()
+    commit_user(db)
     db.refresh(db_kantin)
     
     return db_kantin
 
 @router.get("/", response_model=List[KantinResponse])
-async def get_all_kantin(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_all_kantin(skip: int = 0, limit: int = 100, fields: dict = Depends(kantin_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get all kantin with pagination"""
-    kantin = db.query(Kantin).offset(skip).limit(limit).all()
-    return kantin
+    kantin = db.query(*select_columns(Kantin, fields)).order_by(Kantin.id_kantin).offset(skip).limit(limit).all()
+    return rows_response(kantin)
 
 @router.get("/{kantin_id}", response_model=KantinResponse)
-async def get_kantin(kantin_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_kantin(kantin_id: int, fields: dict = Depends(kantin_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get kantin by ID"""
-    kantin = db.query(Kantin).filter(Kantin.id_kantin == kantin_id).first()
+    kantin = db.query(*select_columns(Kantin, fields)).filter(Kantin.id_kantin == kantin_id).first()
     if kantin is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
-    return kantin
+    return ORJSONResponse(kantin._asdict())
 
 @router.get("/{kantin_id}/with-menus", response_model=KantinWithMenus)
-async def get_kantin_with_menus(kantin_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_kantin_with_menus(kantin_id: int, request: Request, fields: dict = Depends(field_selection(KantinWithMenus)), current_user = Depends(get_current_principal)):
     """Get kantin with all its menus"""
-    kantin = db.query(Kantin).filter(Kantin.id_kantin == kantin_id).first()
-    if kantin is None:
+    # Concurrent requests for the same kantin and fields share one load
+    body = await catalog_flight.do(
+        ("kantin-with-menus", kantin_id, selection_key(fields)), lambda: load_kantin_with_menus(kantin_id, fields)
+    )
+    if body is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
-    return kantin
+    return await precompressed_response(request, body)
+
+@router.get("/{kantin_id}/export")
+async def export_pesanan(
+    kantin_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    current_kantin: Kantin = Depends(get_current_kantin)
+):
+    """Stream the kantin's order history with lines, menu names and totals"""
+    # Only allow kantin to export their own orders
+    if current_kantin.id_kantin != kantin_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only export pesanan for your kantin"
+        )
+
+    if format == "csv":
+        body, media_type = stream_csv(kantin_id, date_from, date_to), "text/csv"
+    else:
+        body, media_type = stream_ndjson(kantin_id, date_from, date_to), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="pesanan-kantin-{kantin_id}.{format}"'}
+    )
+
+@router.get("/{kantin_id}/analytics", response_model=KantinAnalytics)
+async def get_analytics(
+    kantin_id: int,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    top: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_kantin: Kantin = Depends(get_current_kantin)
+):
+    """Get revenue per day and hour, order counts, top menus and average basket size"""
+    # Only allow kantin to view their own analytics
+    if current_kantin.id_kantin != kantin_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view analytics for your kantin"
+        )
+
+    # Default to the last 30 days, end date exclusive
+    date_to = date_to or date.today() + timedelta(days=1)
+    date_from = date_from or date_to - timedelta(days=30)
+
+    return get_kantin_analytics(db, kantin_id, date_from, date_to, top)
 
 @router.put("/{kantin_id}", response_model=KantinResponse)
 async def update_kantin(
@@ -76,12 +156,8 @@ async def update_kantin(
     update_data = kantin_update.dict(exclude_unset=True)
     
     # Check email uniqueness if email is being updated
-    if "email" in update_data:
-        existing_kantin = db.query(Kantin).filter(
-            Kantin.email == update_data["email"],
-            Kantin.id_kantin != kantin_id
-        ).first()
-        if existing_kantin:
+    if "email" in update_data and update_data["email"] != kantin.email:
+        if email_registered(db, update_data["email"]):
             raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password if being updated
@@ -91,7 +167,12 @@ async def update_kantin(
     for field, value in update_data.items():
         setattr(kantin, field, value)
     
-    db.commit()
+    # A new password signs out every existing session
+    if "password" in update_data:
+        db.flush()
+        revoke_user_tokens(db, "kantin", kantin.id_kantin)
+    
+    commit_user(db)
     db.refresh(kantin)
     
     return kantin
@@ -110,16 +191,17 @@ async def delete_kantin(kantin_id: int, db: Session = Depends(get_db), current_k
     
     db.delete(kantin)
     db.commit()
+    revoke_tokens("kantin", kantin_id, ACCOUNT_DELETED)
     
     return None
 
 @router.get("/email/{email}", response_model=KantinResponse)
-async def get_kantin_by_email(email: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_kantin_by_email(email: str, fields: dict = Depends(kantin_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get kantin by email"""
-    kantin = db.query(Kantin).filter(Kantin.email == email).first()
+    kantin = db.query(*select_columns(Kantin, fields)).filter(Kantin.email == email).first()
     if kantin is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
-    return kantin
+    return ORJSONResponse(kantin._asdict())
 
 @router.put("/complete-profile", response_model=KantinResponse)
 async def complete_kantin_profile(
@@ -4,16 +4,20 @@ from typing import List
 from database import get_db
 from models import Mahasiswa
 from schemas import MahasiswaCreate, MahasiswaUpdate, MahasiswaResponse, MahasiswaProfileUpdate
-from auth import get_password_hash, get_current_mahasiswa, get_current_user
+from auth import get_password_hash, get_current_mahasiswa, get_current_principal, revoke_tokens, ACCOUNT_DELETED
+from accounts import email_registered, commit_user, revoke_user_tokens
+from responses import rows_response, ORJSONResponse
+from fields import field_selection, select_columns
 
 router = APIRouter()
 
+mahasiswa_fields = field_selection(MahasiswaResponse)
+
 @router.post("/", response_model=MahasiswaResponse, status_code=status.HTTP_201_CREATED)
 async def create_mahasiswa(mahasiswa: MahasiswaCreate, db: Session = Depends(get_db)):
     """Create a new mahasiswa"""
-    # Check if email already exists
-    db_mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.email == mahasiswa.email).first()
-    if db_mahasiswa:
+    # Check if email already exists for any mahasiswa or kantin
+    if email_registered(db, mahasiswa.email):
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
@@ -29,24 +33,24 @@ async def create_mahasiswa(mahasiswa: MahasiswaCreate, db: Session = Depends(get
     )
     
     db.add(db_mahasiswa)
-    db.commit()
+    commit_user(db)
     db.refresh(db_mahasiswa)
     
     return db_mahasiswa
 
 @router.get("/", response_model=List[MahasiswaResponse])
-async def get_all_mahasiswa(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_all_mahasiswa(skip: int = 0, limit: int = 100, fields: dict = Depends(mahasiswa_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get all mahasiswa with pagination"""
-    mahasiswa = db.query(Mahasiswa).offset(skip).limit(limit).all()
-    return mahasiswa
+    mahasiswa = db.query(*select_columns(Mahasiswa, fields)).order_by(Mahasiswa.id_mahasiswa).offset(skip).limit(limit).all()
+    return rows_response(mahasiswa)
 
 @router.get("/{mahasiswa_id}", response_model=MahasiswaResponse)
-async def get_mahasiswa(mahasiswa_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_mahasiswa(mahasiswa_id: int, fields: dict = Depends(mahasiswa_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get mahasiswa by ID"""
-    mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.id_mahasiswa == mahasiswa_id).first()
+    mahasiswa = db.query(*select_columns(Mahasiswa, fields)).filter(Mahasiswa.id_mahasiswa == mahasiswa_id).first()
     if mahasiswa is None:
         raise HTTPException(status_code=404, detail="Mahasiswa not found")
-    return mahasiswa
+    return ORJSONResponse(mahasiswa._asdict())
 
 @router.put("/{mahasiswa_id}", response_model=MahasiswaResponse)
 async def update_mahasiswa(
@@ -69,12 +73,8 @@ async def update_mahasiswa(
     update_data = mahasiswa_update.dict(exclude_unset=True)
     
     # Check email uniqueness if email is being updated
-    if "email" in update_data:
-        existing_mahasiswa = db.query(Mahasiswa).filter(
-            Mahasiswa.email == update_data["email"],
-            Mahasiswa.id_mahasiswa != mahasiswa_id
-        ).first()
-        if existing_mahasiswa:
+    if "email" in update_data and update_data["email"] != mahasiswa.email:
+        if email_registered(db, update_data["email"]):
             raise HTTPException(status_code=400, detail="Email already registered")
     
     # Hash password if being updated
@@ -84,7 +84,12 @@ async def update_mahasiswa(
     for field, value in update_data.items():
         setattr(mahasiswa, field, value)
     
-    db.commit()
+    # A new password signs out every existing session
+    if "password" in update_data:
+        db.flush()
+        revoke_user_tokens(db, "mahasiswa", mahasiswa.id_mahasiswa)
+    
+    commit_user(db)
     db.refresh(mahasiswa)
     
     return mahasiswa
@@ -103,16 +108,17 @@ async def delete_mahasiswa(mahasiswa_id: int, db: Session = Depends(get_db), cur
     
     db.delete(mahasiswa)
     db.commit()
+    revoke_tokens("mahasiswa", mahasiswa_id, ACCOUNT_DELETED)
     
     return None
 
 @router.get("/email/{email}", response_model=MahasiswaResponse)
-async def get_mahasiswa_by_email(email: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_mahasiswa_by_email(email: str, fields: dict = Depends(mahasiswa_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get mahasiswa by email"""
-    mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.email == email).first()
+    mahasiswa = db.query(*select_columns(Mahasiswa, fields)).filter(Mahasiswa.email == email).first()
     if mahasiswa is None:
         raise HTTPException(status_code=404, detail="Mahasiswa not found")
-    return mahasiswa
+    return ORJSONResponse(mahasiswa._asdict())
 
 @router.put("/complete-profile", response_model=MahasiswaResponse)
 async def complete_mahasiswa_profile(
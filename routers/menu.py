@@ -1,15 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from decimal import Decimal
-from database import get_db
-from models import Menu, Kantin, TipeMenuEnum
-from schemas import MenuCreate, MenuUpdate, MenuResponse, MenuWithKantin
+from database import get_db, SessionLocal
+from models import Menu, Kantin, TipeMenuEnum, SkorMenu
+from schemas import MenuCreate, MenuUpdate, MenuResponse, MenuWithKantin, MenuBulkResult, MenuBatch
 from supabase_storage import upload_image, delete_image
-from auth import get_current_kantin, get_current_user, get_current_kantin_with_profile
+from auth import get_current_kantin, get_current_principal, get_current_kantin_with_profile
+from responses import schema_columns, rows_response, dumps, ORJSONResponse
+from singleflight import catalog_flight
+from compression import precompressed_response
+from batch import batch_ids
+from fields import field_selection, select_columns, prune, selection_key
+from menu_import import parse_rows, import_menu, BulkFormatError, MENU_BULK_MAX_ITEMS
 
 router = APIRouter()
 
+MENU_COLUMNS = schema_columns(Menu, MenuResponse)
+menu_fields = field_selection(MenuResponse)
+
+def sort_menu(query, sort: Optional[str], rank_column):
+    """Order a menu query by a precomputed popularity rank when sort=popular"""
+    if sort != "popular":
+        return query
+    return query.outerjoin(SkorMenu, SkorMenu.id_menu == Menu.id_menu).order_by(
+        rank_column.asc().nullslast(), Menu.id_menu
+    )
+
+def load_menu_by_kantin(kantin_id: int, sort: Optional[str], columns: tuple = MENU_COLUMNS) -> Optional[bytes]:
+    """Load and encode the menus of a kantin, or None if the kantin does not exist"""
+    db = SessionLocal()
+    try:
+        # Check if kantin exists
+        kantin = db.query(Kantin.id_kantin).filter(Kantin.id_kantin == kantin_id).first()
+        if kantin is None:
+            return None
+        menu = db.query(*columns).filter(Menu.id_kantin == kantin_id)
+        menu = sort_menu(menu, sort, SkorMenu.peringkat_kantin).all()
+        return dumps([row._asdict() for row in menu])
+    finally:
+        db.close()
+
 @router.post("/", response_model=MenuResponse, status_code=status.HTTP_201_CREATED)
 async def create_menu(menu: MenuCreate, db: Session = Depends(get_db), current_kantin: Kantin = Depends(get_current_kantin_with_profile)):
     """Create a new menu item"""
@@ -69,38 +100,88 @@ async def create_menu_with_image(
 
     return db_menu
 
+@router.post("/bulk", response_model=MenuBulkResult)
+async def bulk_import_menu(request: Request, db: Session = Depends(get_db), current_kantin: Kantin = Depends(get_current_kantin_with_profile)):
+    """Create or update many menu items of the current kantin from a JSON array or CSV (text/csv) body.
+
+    Items are matched to existing menus by nama_menu. Valid rows are written in
+    one transaction; invalid rows are skipped and reported by row number.
+    """
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except BulkFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    if len(rows) > MENU_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MENU_BULK_MAX_ITEMS} items per request"
+        )
+
+    return import_menu(db, current_kantin.id_kantin, rows)
+
 @router.get("/", response_model=List[MenuResponse])
-async def get_all_menu(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_all_menu(skip: int = 0, limit: int = 100, fields: dict = Depends(menu_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get all menu items with pagination"""
-    menu = db.query(Menu).offset(skip).limit(limit).all()
-    return menu
+    menu = db.query(*select_columns(Menu, fields)).order_by(Menu.id_menu).offset(skip).limit(limit).all()
+    return rows_response(menu)
 
 @router.get("/kantin/{kantin_id}", response_model=List[MenuResponse])
-async def get_menu_by_kantin(kantin_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    """Get all menu items for a specific kantin"""
-    # Check if kantin exists
-    kantin = db.query(Kantin).filter(Kantin.id_kantin == kantin_id).first()
-    if kantin is None:
+async def get_menu_by_kantin(
+    kantin_id: int,
+    request: Request,
+    sort: Optional[str] = Query(None, pattern="^popular$"),
+    fields: dict = Depends(menu_fields),
+    current_user = Depends(get_current_principal)
+):
+    """Get all menu items for a specific kantin, optionally most popular first"""
+    # Concurrent requests for the same kantin and fields share one load
+    columns = select_columns(Menu, fields)
+    body = await catalog_flight.do(
+        ("menu-kantin", kantin_id, sort, selection_key(fields)), lambda: load_menu_by_kantin(kantin_id, sort, columns)
+    )
+    if body is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
-
-    menu = db.query(Menu).filter(Menu.id_kantin == kantin_id).all()
-    return menu
+    return await precompressed_response(request, body)
+
+@router.get("/batch", response_model=MenuBatch)
+async def get_menu_batch(ids: List[int] = Depends(batch_ids), fields: dict = Depends(menu_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
+    """Get several menu items by ID in one query, reporting IDs that do not exist"""
+    menu = {
+        row.id_menu: prune(row._asdict(), fields)
+        for row in db.query(*select_columns(Menu, fields, "id_menu")).filter(Menu.id_menu.in_(ids))
+    }
+    return ORJSONResponse({
+        "items": [menu[menu_id] for menu_id in ids if menu_id in menu],
+        "tidak_ditemukan": [menu_id for menu_id in ids if menu_id not in menu],
+    })
 
 @router.get("/{menu_id}", response_model=MenuResponse)
-async def get_menu(menu_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_menu(menu_id: int, fields: dict = Depends(menu_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get menu item by ID"""
-    menu = db.query(Menu).filter(Menu.id_menu == menu_id).first()
+    menu = db.query(*select_columns(Menu, fields)).filter(Menu.id_menu == menu_id).first()
     if menu is None:
         raise HTTPException(status_code=404, detail="Menu not found")
-    return menu
+    return ORJSONResponse(menu._asdict())
 
 @router.get("/{menu_id}/with-kantin", response_model=MenuWithKantin)
-async def get_menu_with_kantin(menu_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_menu_with_kantin(
+    menu_id: int,
+    fields: dict = Depends(field_selection(MenuWithKantin)),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
     """Get menu item with kantin information"""
-    menu = db.query(Menu).filter(Menu.id_menu == menu_id).first()
+    menu = db.query(*select_columns(Menu, fields, "id_kantin")).filter(Menu.id_menu == menu_id).first()
     if menu is None:
         raise HTTPException(status_code=404, detail="Menu not found")
-    return menu
+    
+    result = prune(menu._asdict(), fields)
+    # The kantin is only loaded when it was selected
+    if "kantin" in fields:
+        kantin = db.query(*select_columns(Kantin, fields["kantin"])).filter(Kantin.id_kantin == menu.id_kantin).first()
+        result["kantin"] = kantin._asdict() if kantin is not None else None
+    return ORJSONResponse(result)
 
 @router.put("/{menu_id}", response_model=MenuResponse)
 async def update_menu(
@@ -188,24 +269,31 @@ async def delete_menu(menu_id: int, db: Session = Depends(get_db), current_kanti
     return None
 
 @router.get("/search/{query}", response_model=List[MenuResponse])
-async def search_menu(query: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def search_menu(query: str, fields: dict = Depends(menu_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Search menu items by name"""
-    menu = db.query(Menu).filter(Menu.nama_menu.ilike(f"%{query}%")).all()
-    return menu
+    menu = db.query(*select_columns(Menu, fields)).filter(Menu.nama_menu.ilike(f"%{query}%")).all()
+    return rows_response(menu)
 
 @router.get("/tipe/{tipe_menu}", response_model=List[MenuResponse])
-async def get_menu_by_tipe(tipe_menu: TipeMenuEnum, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    """Get menu items by type"""
-    menu = db.query(Menu).filter(Menu.tipe_menu == tipe_menu).all()
-    return menu
+async def get_menu_by_tipe(
+    tipe_menu: TipeMenuEnum,
+    sort: Optional[str] = Query(None, pattern="^popular$"),
+    fields: dict = Depends(menu_fields),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
+    """Get menu items by type, optionally most popular first"""
+    menu = db.query(*select_columns(Menu, fields)).filter(Menu.tipe_menu == tipe_menu)
+    menu = sort_menu(menu, sort, SkorMenu.peringkat_tipe).all()
+    return rows_response(menu)
 
 @router.get("/kantin/{kantin_id}/tipe/{tipe_menu}", response_model=List[MenuResponse])
-async def get_menu_by_kantin_and_tipe(kantin_id: int, tipe_menu: TipeMenuEnum, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_menu_by_kantin_and_tipe(kantin_id: int, tipe_menu: TipeMenuEnum, fields: dict = Depends(menu_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
     """Get menu items by kantin and type"""
     # Check if kantin exists
-    kantin = db.query(Kantin).filter(Kantin.id_kantin == kantin_id).first()
+    kantin = db.query(Kantin.id_kantin).filter(Kantin.id_kantin == kantin_id).first()
     if kantin is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
 
-    menu = db.query(Menu).filter(Menu.id_kantin == kantin_id, Menu.tipe_menu == tipe_menu).all()
-    return menu
+    menu = db.query(*select_columns(Menu, fields)).filter(Menu.id_kantin == kantin_id, Menu.tipe_menu == tipe_menu).all()
+    return rows_response(menu)
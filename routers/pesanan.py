@@ -137,19 +137,42 @@ async def update_pesanan_status(
     db.refresh(pesanan)
     
     return pesanan
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Header
+from sqlalchemy.orm import Session
+from typing import List, Optional
 from database import get_db
-from models import Pesanan, Mahasiswa, Kantin
-from schemas import PesananCreate, PesananUpdate, PesananResponse, PesananWithDetails
-from auth import get_current_mahasiswa, get_current_kantin, get_current_user, get_current_mahasiswa_with_profile
+from models import Pesanan, DetailPesanan, Mahasiswa, Kantin
+from schemas import PesananCreate, PesananUpdate, PesananResponse, PesananWithDetails, PesananBatch
+from auth import get_current_mahasiswa, get_current_kantin, get_current_principal, get_current_mahasiswa_with_profile
+from responses import rows_response, ORJSONResponse
+from analytics import record_status_change, is_selesai, apply_pesanan
+from idempotency import idempotent
+from batch import batch_ids
+from fields import field_selection, select_columns, prune
 
 router = APIRouter()
 
+pesanan_fields = field_selection(PesananResponse)
+
+def check_pesanan_access(current_user, pesanan):
+    """Mahasiswa may view their own pesanan, kantin those for their kantin"""
+    if current_user.is_mahasiswa:
+        if pesanan.id_mahasiswa != current_user.id_mahasiswa:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only view your own pesanan"
+            )
+    elif current_user.is_kantin:
+        if pesanan.id_kantin != current_user.id_kantin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only view pesanan for your kantin"
+            )
+
 @router.post("/", response_model=PesananResponse, status_code=status.HTTP_201_CREATED)
 async def create_pesanan(
     pesanan: PesananCreate, 
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_mahasiswa: Mahasiswa = Depends(get_current_mahasiswa_with_profile)
 ):
@@ -166,97 +189,125 @@ async def create_pesanan(
     if kantin is None:
         raise HTTPException(status_code=404, detail="Kantin not found")
     
-    db_pesanan = Pesanan(
-        id_kantin=pesanan.id_kantin,
-        id_mahasiswa=pesanan.id_mahasiswa,
-        status=pesanan.status
-    )
+    def create():
+        db_pesanan = Pesanan(
+            id_kantin=pesanan.id_kantin,
+            id_mahasiswa=pesanan.id_mahasiswa,
+            status=pesanan.status
+        )
     
-    db.add(db_pesanan)
-    db.commit()
-    db.refresh(db_pesanan)
+        db.add(db_pesanan)
+        db.flush()
+        # An order created as "selesai" counts in the rollups from the start (tanggal comes from the database)
+        db.refresh(db_pesanan)
+        record_status_change(db, db_pesanan, None)
+        db.commit()
+        db.refresh(db_pesanan)
     
-    return db_pesanan
+        return db_pesanan
+    
+    # Retries with the same Idempotency-Key replay the first response
+    return await idempotent(
+        idempotency_key, f"pesanan:{current_mahasiswa.id_mahasiswa}", pesanan,
+        PesananResponse, create, status.HTTP_201_CREATED
+    )
 
 @router.get("/", response_model=List[PesananResponse])
 async def get_all_pesanan(
     skip: int = 0, 
     limit: int = 100, 
+    fields: dict = Depends(pesanan_fields),
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """Get all pesanan (filtered by user type)"""
-    if isinstance(current_user, Mahasiswa):
+    columns = select_columns(Pesanan, fields)
+    if current_user.is_mahasiswa:
         # Mahasiswa can only see their own pesanan
-        pesanan = db.query(Pesanan).filter(
+        pesanan = db.query(*columns).filter(
             Pesanan.id_mahasiswa == current_user.id_mahasiswa
-        ).offset(skip).limit(limit).all()
-    elif isinstance(current_user, Kantin):
+        ).order_by(Pesanan.id_pesanan).offset(skip).limit(limit).all()
+    elif current_user.is_kantin:
         # Kantin can only see pesanan for their kantin
-        pesanan = db.query(Pesanan).filter(
+        pesanan = db.query(*columns).filter(
             Pesanan.id_kantin == current_user.id_kantin
-        ).offset(skip).limit(limit).all()
+        ).order_by(Pesanan.id_pesanan).offset(skip).limit(limit).all()
     
-    return pesanan
+    return rows_response(pesanan)
+
+@router.get("/batch", response_model=PesananBatch)
+async def get_pesanan_batch(ids: List[int] = Depends(batch_ids), fields: dict = Depends(pesanan_fields), db: Session = Depends(get_db), current_user = Depends(get_current_principal)):
+    """Get several pesanan by ID in one query; IDs that are missing or not visible to the user are reported"""
+    columns = select_columns(Pesanan, fields, "id_pesanan", "id_mahasiswa", "id_kantin")
+    rows = {row.id_pesanan: row._asdict() for row in db.query(*columns).filter(Pesanan.id_pesanan.in_(ids))}
+    
+    result = {"items": [], "tidak_ditemukan": [], "ditolak": []}
+    for pesanan_id in ids:
+        pesanan = rows.get(pesanan_id)
+        if pesanan is None:
+            result["tidak_ditemukan"].append(pesanan_id)
+        # Same rule as GET /{pesanan_id}: mahasiswa see their own pesanan, kantin those for their kantin
+        elif (current_user.is_mahasiswa and pesanan["id_mahasiswa"] != current_user.id_mahasiswa) or \
+                (current_user.is_kantin and pesanan["id_kantin"] != current_user.id_kantin):
+            result["ditolak"].append(pesanan_id)
+        else:
+            result["items"].append(prune(pesanan, fields))
+    return ORJSONResponse(result)
 
 @router.get("/{pesanan_id}", response_model=PesananResponse)
 async def get_pesanan(
     pesanan_id: int, 
+    fields: dict = Depends(pesanan_fields),
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """Get pesanan by ID"""
-    pesanan = db.query(Pesanan).filter(Pesanan.id_pesanan == pesanan_id).first()
+    pesanan = db.query(*select_columns(Pesanan, fields, "id_mahasiswa", "id_kantin")).filter(
+        Pesanan.id_pesanan == pesanan_id
+    ).first()
     if pesanan is None:
         raise HTTPException(status_code=404, detail="Pesanan not found")
     
     # Check access permissions
-    if isinstance(current_user, Mahasiswa):
-        if pesanan.id_mahasiswa != current_user.id_mahasiswa:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only view your own pesanan"
-            )
-    elif isinstance(current_user, Kantin):
-        if pesanan.id_kantin != current_user.id_kantin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only view pesanan for your kantin"
-            )
+    check_pesanan_access(current_user, pesanan)
     
-    return pesanan
+    return ORJSONResponse(prune(pesanan._asdict(), fields))
 
 @router.get("/{pesanan_id}/with-details", response_model=PesananWithDetails)
 async def get_pesanan_with_details(
     pesanan_id: int, 
+    fields: dict = Depends(field_selection(PesananWithDetails)),
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     """Get pesanan with all details"""
-    pesanan = db.query(Pesanan).options(
-        joinedload(Pesanan.detail_pesanan),
-        joinedload(Pesanan.mahasiswa),
-        joinedload(Pesanan.kantin)
-    ).filter(Pesanan.id_pesanan == pesanan_id).first()
+    pesanan = db.query(*select_columns(Pesanan, fields, "id_mahasiswa", "id_kantin")).filter(
+        Pesanan.id_pesanan == pesanan_id
+    ).first()
     
     if pesanan is None:
         raise HTTPException(status_code=404, detail="Pesanan not found")
     
     # Check access permissions
-    if isinstance(current_user, Mahasiswa):
-        if pesanan.id_mahasiswa != current_user.id_mahasiswa:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only view your own pesanan"
-            )
-    elif isinstance(current_user, Kantin):
-        if pesanan.id_kantin != current_user.id_kantin:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only view pesanan for your kantin"
-            )
-    
-    return pesanan
+    check_pesanan_access(current_user, pesanan)
+    
+    # Each relation is only queried when selected, and only for its selected columns
+    result = prune(pesanan._asdict(), fields)
+    if "detail_pesanan" in fields:
+        details = db.query(*select_columns(DetailPesanan, fields["detail_pesanan"])).filter(
+            DetailPesanan.id_pesanan == pesanan_id
+        ).order_by(DetailPesanan.id_detail).all()
+        result["detail_pesanan"] = [row._asdict() for row in details]
+    if "mahasiswa" in fields:
+        mahasiswa = db.query(*select_columns(Mahasiswa, fields["mahasiswa"])).filter(
+            Mahasiswa.id_mahasiswa == pesanan.id_mahasiswa
+        ).first()
+        result["mahasiswa"] = mahasiswa._asdict() if mahasiswa is not None else None
+    if "kantin" in fields:
+        kantin = db.query(*select_columns(Kantin, fields["kantin"])).filter(Kantin.id_kantin == pesanan.id_kantin).first()
+        result["kantin"] = kantin._asdict() if kantin is not None else None
+    
+    return ORJSONResponse(result)
 
 @router.put("/{pesanan_id}", response_model=PesananResponse)
 async def update_pesanan(
@@ -279,10 +330,14 @@ async def update_pesanan(
     
     # Update fields if provided
     update_data = pesanan_update.dict(exclude_unset=True)
+    previous_status = pesanan.status
     
     for field, value in update_data.items():
         setattr(pesanan, field, value)
     
+    # Keep sales rollups in step with completed orders
+    record_status_change(db, pesanan, previous_status)
+    
     db.commit()
     db.refresh(pesanan)
     
@@ -306,6 +361,9 @@ async def delete_pesanan(
             detail="You can only delete your own pesanan"
         )
     
+    if is_selesai(pesanan.status):
+        apply_pesanan(db, pesanan, -1)
+    
     db.delete(pesanan)
     db.commit()
     
@@ -314,6 +372,7 @@ async def delete_pesanan(
 @router.get("/mahasiswa/{mahasiswa_id}", response_model=List[PesananResponse])
 async def get_pesanan_by_mahasiswa(
     mahasiswa_id: int, 
+    fields: dict = Depends(pesanan_fields),
     db: Session = Depends(get_db),
     current_mahasiswa: Mahasiswa = Depends(get_current_mahasiswa)
 ):
@@ -325,12 +384,13 @@ async def get_pesanan_by_mahasiswa(
             detail="You can only view your own pesanan"
         )
     
-    pesanan = db.query(Pesanan).filter(Pesanan.id_mahasiswa == mahasiswa_id).all()
-    return pesanan
+    pesanan = db.query(*select_columns(Pesanan, fields)).filter(Pesanan.id_mahasiswa == mahasiswa_id).all()
+    return rows_response(pesanan)
 
 @router.get("/kantin/{kantin_id}", response_model=List[PesananResponse])
 async def get_pesanan_by_kantin(
     kantin_id: int, 
+    fields: dict = Depends(pesanan_fields),
     db: Session = Depends(get_db),
     current_kantin: Kantin = Depends(get_current_kantin)
 ):
@@ -342,5 +402,5 @@ async def get_pesanan_by_kantin(
             detail="You can only view pesanan for your kantin"
         )
     
-    pesanan = db.query(Pesanan).filter(Pesanan.id_kantin == kantin_id).all()
-    return pesanan
+    pesanan = db.query(*select_columns(Pesanan, fields)).filter(Pesanan.id_kantin == kantin_id).all()
+    return rows_response(pesanan)
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional, List
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, date
 from enum import Enum
 
 class StatusPesananEnum(str, Enum):
@@ -93,6 +93,15 @@ class MenuUpdate(BaseModel):
     img_menu: Optional[str] = None
     tipe_menu: Optional[TipeMenuEnum] = None
 
+class MenuBulkError(BaseModel):
+    baris: int
+    errors: List[str]
+
+class MenuBulkResult(BaseModel):
+    dibuat: int
+    diperbarui: int
+    gagal: List[MenuBulkError] = []
+
 class MenuResponse(MenuBase):
     id_menu: int
     id_kantin: int
@@ -145,8 +154,44 @@ class PesananWithDetails(PesananResponse):
     mahasiswa: Optional[MahasiswaResponse] = None
     kantin: Optional[KantinResponse] = None
 
+class MenuBatch(BaseModel):
+    items: List[MenuResponse] = []
+    tidak_ditemukan: List[int] = []
+
+class PesananBatch(BaseModel):
+    items: List[PesananResponse] = []
+    tidak_ditemukan: List[int] = []
+    ditolak: List[int] = []
+
 class MenuWithKantin(MenuResponse):
     kantin: Optional[KantinResponse] = None
 
 class KantinWithMenus(KantinResponse):
     menu: List[MenuResponse] = []
+
+# Analytics schemas
+class PenjualanRingkas(BaseModel):
+    jumlah_pesanan: int
+    jumlah_item: int
+    total_pendapatan: Decimal
+
+class PenjualanPerHari(PenjualanRingkas):
+    tanggal: date
+
+class PenjualanPerJam(PenjualanRingkas):
+    jam: int
+
+class MenuTerlaris(BaseModel):
+    id_menu: int
+    nama_menu: str
+    jumlah: int
+    total_pendapatan: Decimal
+
+class KantinAnalytics(PenjualanRingkas):
+    id_kantin: int
+    dari: date
+    sampai: date
+    rata_rata_keranjang: Decimal
+    per_hari: List[PenjualanPerHari] = []
+    per_jam: List[PenjualanPerJam] = []
+    menu_terlaris: List[MenuTerlaris] = []
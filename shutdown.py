@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from functools import partial
+from request_context import start_draining, is_draining, draining_since
+
+logger = logging.getLogger(__name__)
+
+# Whole shutdown, from the termination signal to exit; keep it below the orchestrator's grace period
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "25"))
+# After the signal the app keeps serving, reporting not ready, so load balancers stop routing to it first
+SHUTDOWN_DRAIN_DELAY_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_DELAY_SECONDS", "5"))
+# Kept for the lifespan shutdown: background jobs, final metrics and database connections
+SHUTDOWN_LIFESPAN_SECONDS = float(os.getenv("SHUTDOWN_LIFESPAN_SECONDS", "5"))
+
+_forwarded = False
+
+def request_timeout() -> float:
+    """How long uvicorn may wait for open requests once it stops listening"""
+    return max(0.0, SHUTDOWN_TIMEOUT_SECONDS - SHUTDOWN_DRAIN_DELAY_SECONDS - SHUTDOWN_LIFESPAN_SECONDS)
+
+def lifespan_timeout() -> float:
+    """What is left of the shutdown timeout for the lifespan shutdown, but at least its reserved share"""
+    started = draining_since()
+    if started is None:
+        return SHUTDOWN_LIFESPAN_SECONDS
+    return max(SHUTDOWN_LIFESPAN_SECONDS, started + SHUTDOWN_TIMEOUT_SECONDS - time.monotonic())
+
+def install_signal_handlers():
+    """Start draining as soon as the server is told to stop, before uvicorn closes its listener.
+
+    Called from the lifespan startup, while uvicorn's own SIGINT/SIGTERM handlers
+    are installed. They are wrapped so that the first signal marks the instance
+    as draining and reaches uvicorn only after SHUTDOWN_DRAIN_DELAY_SECONDS; a
+    second signal is passed on at once. When uvicorn was started without
+    --timeout-graceful-shutdown, its wait for open requests is bounded too.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        original = signal.getsignal(sig)
+        if not callable(original):
+            continue
+        config = getattr(getattr(original, "__self__", None), "config", None)
+        if config is not None and getattr(config, "timeout_graceful_shutdown", 0) is None:
+            config.timeout_graceful_shutdown = request_timeout()
+        signal.signal(sig, partial(_handle_exit, loop, original))
+
+def _handle_exit(loop, original, sig, frame):
+    if is_draining():
+        _forward(original, sig)
+        return
+    start_draining()
+    logger.info("Received %s, draining for %.0f s before closing the listener", signal.Signals(sig).name, SHUTDOWN_DRAIN_DELAY_SECONDS)
+    loop.call_soon_threadsafe(loop.call_later, SHUTDOWN_DRAIN_DELAY_SECONDS, _forward, original, sig, True)
+
+def _forward(original, sig, delayed=False):
+    global _forwarded
+    # A second signal already passed the first one on
+    if delayed and _forwarded:
+        return
+    _forwarded = True
+    original(sig, None)
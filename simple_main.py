@@ -4,6 +4,8 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
 from routers import mahasiswa, kantin, menu, pesanan, detail_pesanan
+from responses import ORJSONResponse
+import health
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -14,7 +16,8 @@ app = FastAPI(
     description="FastAPI backend untuk sistem pemesanan kantin universitas dengan MinIO storage",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -32,6 +35,7 @@ app.include_router(kantin.router, prefix="/api/v1/kantin", tags=["Kantin"])
 app.include_router(menu.router, prefix="/api/v1/menu", tags=["Menu"])
 app.include_router(pesanan.router, prefix="/api/v1/pesanan", tags=["Pesanan"])
 app.include_router(detail_pesanan.router, prefix="/api/v1/detail-pesanan", tags=["Detail Pesanan"])
+app.include_router(health.router, tags=["Health"])
 
 @app.get("/")
 async def root():
@@ -50,10 +54,6 @@ async def root():
         }
     }
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "database": "connected"}
-
 if __name__ == "__main__":
     uvicorn.run(
         "simple_main:app",
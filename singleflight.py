@@ -0,0 +1,64 @@
+import asyncio
+import os
+from collections import Counter
+from starlette.concurrency import run_in_threadpool
+
+SINGLEFLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLEFLIGHT_TIMEOUT_SECONDS", "5"))
+
+class SingleFlight:
+    """Share one in-flight load between concurrent callers asking for the same key.
+
+    The first caller for a key runs the blocking loader in the threadpool; callers
+    arriving while it runs await the same result. A follower that waits longer than
+    the timeout stops waiting and runs the loader itself.
+    """
+
+    def __init__(self, name: str, timeout: float = SINGLEFLIGHT_TIMEOUT_SECONDS):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._stats = {}
+
+    def _count(self, key, event: str):
+        # Stats are grouped by the first element of the key, e.g. the route name
+        group = key[0] if isinstance(key, tuple) else key
+        self._stats.setdefault(group, Counter())[event] += 1
+
+    async def _load(self, key, loader):
+        try:
+            return await run_in_threadpool(loader)
+        except Exception:
+            self._count(key, "errors")
+            raise
+        finally:
+            self._calls.pop(key, None)
+
+    async def do(self, key, loader):
+        """Return loader() for key, coalescing with a load already in flight"""
+        task = self._calls.get(key)
+        if task is not None:
+            self._count(key, "coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+            except asyncio.TimeoutError:
+                self._count(key, "timeouts")
+                return await run_in_threadpool(loader)
+
+        # The load runs as its own task, so followers still get its result if the first caller is cancelled
+        task = asyncio.create_task(self._load(key, loader))
+        # Mark a failure as retrieved even when no follower is waiting on it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._calls[key] = task
+        self._count(key, "executed")
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Counters per key group plus the number of loads currently in flight"""
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "groups": {group: dict(counter) for group, counter in self._stats.items()},
+        }
+
+# Shared by the hot catalog reads (kantin with menus, menus per kantin)
+catalog_flight = SingleFlight("catalog")
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import event
+from database import engine
+from request_context import current_route
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+# Capture EXPLAIN (ANALYZE, BUFFERS) for slow SELECTs on PostgreSQL; this runs the query again
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() in ("1", "true", "yes")
+# The same statement is explained at most once per cooldown
+SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS = float(os.getenv("SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS", "300"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+
+# Bound parameters whose name contains one of these are never stored
+REDACTED_PARAMS = ("password", "email", "token_hash")
+REDACTED = "[redacted]"
+STATEMENT_MAX_LENGTH = 2000
+VALUE_MAX_LENGTH = 200
+EXPLAIN_MAX_PENDING = 4
+# Statements remembered for the explain cooldown
+EXPLAIN_MAX_STATEMENTS = 1000
+
+def _redact_value(name, value):
+    if name is not None and any(word in name.lower() for word in REDACTED_PARAMS):
+        return REDACTED
+    if isinstance(value, str):
+        # Unnamed values that look like an email address or a password hash
+        if "@" in value or value.startswith("$2"):
+            return REDACTED
+        return value[:VALUE_MAX_LENGTH]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return str(value)
+    return str(value)[:VALUE_MAX_LENGTH]
+
+def redact_parameters(parameters, context=None):
+    """JSON-safe copy of one set of bound parameters with sensitive values replaced"""
+    if isinstance(parameters, dict):
+        return {name: _redact_value(name, value) for name, value in parameters.items()}
+    # Positional parameters are named through the compiled statement when there is one
+    names = list(getattr(getattr(context, "compiled", None), "positiontup", None) or [])
+    return [
+        _redact_value(names[i] if i < len(names) else None, value)
+        for i, value in enumerate(parameters or ())
+    ]
+
+class SlowQueryLog:
+    """Bounded in-memory log of slow statements, newest last"""
+
+    def __init__(self, size: int = SLOW_QUERY_LOG_SIZE):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+
+    def entries(self, route: str = None):
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return [entry for entry in entries if route is None or entry["route"] == route]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_query_log = SlowQueryLog()
+
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_explain_slots = threading.BoundedSemaphore(EXPLAIN_MAX_PENDING)
+# statement -> when it was last explained, oldest first
+_explained_at = OrderedDict()
+_explained_lock = threading.Lock()
+
+def _explain(entry: dict, statement: str, parameters):
+    try:
+        with engine.connect() as connection:
+            # Marks the connection so its own statements are not logged
+            connection.info["slow_query_explain"] = True
+            with connection.begin() as transaction:
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                rows = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+                transaction.rollback()
+            entry["explain"] = "\n".join(row[0] for row in rows)
+    except Exception as exc:
+        entry["explain"] = f"EXPLAIN failed: {exc}"
+    finally:
+        _explain_slots.release()
+
+def _schedule_explain(entry: dict, statement: str, parameters):
+    """Queue an EXPLAIN for a slow SELECT unless one ran recently or too many are pending"""
+    now = time.monotonic()
+    with _explained_lock:
+        # Statements whose cooldown has passed need not be remembered
+        while _explained_at and (
+            now - next(iter(_explained_at.values())) >= SLOW_QUERY_EXPLAIN_COOLDOWN_SECONDS
+            or len(_explained_at) >= EXPLAIN_MAX_STATEMENTS
+        ):
+            _explained_at.popitem(last=False)
+        if statement in _explained_at:
+            return
+        if not _explain_slots.acquire(blocking=False):
+            return
+        _explained_at[statement] = now
+    entry["explain"] = "pending"
+    _explain_executor.submit(_explain, entry, statement, parameters)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.slow_query_start = time.perf_counter()
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - context.slow_query_start) * 1000
+    if duration_ms < SLOW_QUERY_MS or conn.info.get("slow_query_explain"):
+        return
+
+    route = current_route()
+    first = parameters[0] if executemany and parameters else parameters
+    entry = {
+        "waktu": datetime.now(timezone.utc).isoformat(),
+        "durasi_ms": round(duration_ms, 3),
+        "route": route,
+        "statement": statement[:STATEMENT_MAX_LENGTH],
+        "parameter": redact_parameters(first, context),
+        "jumlah_baris_parameter": len(parameters) if executemany else 1,
+        "explain": None,
+    }
+    slow_query_log.add(entry)
+    logger.warning("Slow query (%.1f ms) on %s: %s", duration_ms, route or "no route", " ".join(statement.split())[:300])
+
+    if (
+        SLOW_QUERY_EXPLAIN
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and statement.lstrip().upper().startswith("SELECT")
+    ):
+        _schedule_explain(entry, statement, parameters)
@@ -1,19 +1,32 @@
 import os
 import uuid
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# "supabase" stores images in a Supabase bucket; "local" writes them to a directory served by the app
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "uploads")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "/uploads")
+
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 SUPABASE_BUCKET_NAME = os.getenv("SUPABASE_BUCKET_NAME", "equestrian")
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+supabase: Client = None
+if STORAGE_BACKEND == "local":
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+elif not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     raise ValueError("Missing Supabase credentials in environment variables")
+else:
+    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+def _write_local(filename: str, data: bytes):
+    with open(os.path.join(LOCAL_STORAGE_DIR, filename), "wb") as f:
+        f.write(data)
 
 async def upload_image(file: UploadFile) -> str:
     try:
@@ -25,6 +38,10 @@ async def upload_image(file: UploadFile) -> str:
         filename = f"{uuid.uuid4()}.{ext}"
         data = await file.read()
 
+        if STORAGE_BACKEND == "local":
+            await run_in_threadpool(_write_local, filename, data)
+            return f"{LOCAL_STORAGE_URL}/{filename}"
+
         # Upload file
         res = supabase.storage.from_(SUPABASE_BUCKET_NAME).upload(
             path=filename,
@@ -47,6 +64,9 @@ async def upload_image(file: UploadFile) -> str:
 def delete_image(public_url: str) -> bool:
     try:
         filename = public_url.split("/")[-1]
+        if STORAGE_BACKEND == "local":
+            os.remove(os.path.join(LOCAL_STORAGE_DIR, filename))
+            return True
         supabase.storage.from_(SUPABASE_BUCKET_NAME).remove([filename])
         return True
     except Exception as e:
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+# Configure the app before it is imported: a throwaway SQLite database and local image storage
+_workdir = tempfile.mkdtemp(prefix="kudakan-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(_workdir, "uploads")
+os.makedirs(os.environ["LOCAL_STORAGE_DIR"])
+
+import pytest
+from fastapi.testclient import TestClient
+import auth
+import ratelimit
+from database import engine, Base
+
+@pytest.fixture
+def client():
+    """Client against an empty database, with no revocations or rate limits carried over"""
+    import main
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    auth._revoked_versions.clear()
+    auth._token_cache.clear()
+    ratelimit.store._buckets.clear()
+    return TestClient(main.app)
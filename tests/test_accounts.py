@@ -0,0 +1,55 @@
+from sqlalchemy import event
+from accounts import backfill_accounts
+from auth import get_password_hash
+from database import SessionLocal, engine
+from models import Akun, Mahasiswa, Kantin
+
+API = "/api/v1"
+
+def add_legacy_users():
+    """Users created before the akun index existed"""
+    # Core inserts skip the mapper events that keep akun in sync
+    with engine.begin() as connection:
+        connection.execute(Mahasiswa.__table__.insert().values(nama="M", email="sama@example.com", password=get_password_hash("mahasiswa1"), nim="1"))
+        connection.execute(Kantin.__table__.insert(), [
+            {"nama_kantin": "K", "email": "sama@example.com", "password": get_password_hash("kantin123")},
+            {"nama_kantin": "K2", "email": "k2@example.com", "password": get_password_hash("kantin456")},
+        ])
+
+def test_backfill_indexes_legacy_users_once(client):
+    add_legacy_users()
+    db = SessionLocal()
+    try:
+        # The kantin sharing the mahasiswa's email is left out
+        assert backfill_accounts(db) == 2
+        assert backfill_accounts(db) == 0
+        assert sorted(db.query(Akun.user_type, Akun.email)) == [("kantin", "k2@example.com"), ("mahasiswa", "sama@example.com")]
+    finally:
+        db.close()
+
+    response = client.post(f"{API}/auth/login", json={"email": "k2@example.com", "password": "kantin456"})
+    assert response.status_code == 200
+    assert response.json()["user_type"] == "kantin"
+
+def test_failed_login_runs_one_query(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(f"{API}/auth/login", json={"email": "tidak.ada@example.com", "password": "rahasia123"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 401
+    assert len(statements) == 1
+
+def test_registration_racing_on_an_email_gets_400(client, monkeypatch):
+    import routers.kantin
+    response = client.post(f"{API}/mahasiswa/", json={"nama": "M", "email": "m@example.com", "password": "rahasia123", "nim": "1"})
+    assert response.status_code == 201
+    # As if both requests passed the check before either committed
+    monkeypatch.setattr(routers.kantin, "email_registered", lambda db, email: False)
+    response = client.post(f"{API}/kantin/", json={"nama_kantin": "K", "email": "m@example.com", "password": "rahasia123"})
+    assert response.status_code == 400
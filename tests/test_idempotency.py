@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+from idempotency import IdempotencyStore
+from singleflight import SingleFlight
+
+def slow_write(calls):
+    def write():
+        calls.append(threading.get_ident())
+        time.sleep(0.2)
+        return 201, b'{"id_pesanan": 1}'
+    return write
+
+def test_cancelled_request_still_stores_the_write_for_retries():
+    store = IdempotencyStore()
+    calls = []
+
+    async def scenario():
+        write = slow_write(calls)
+        leader = asyncio.create_task(store.execute("pesanan:k", b"fp", write))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(store.execute("pesanan:k", b"fp", write))
+        await asyncio.sleep(0.05)
+        # As when uvicorn cancels requests at the end of the graceful shutdown timeout
+        leader.cancel()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        retry = await store.execute("pesanan:k", b"fp", write)
+        return results, retry
+
+    (leader, follower), retry = asyncio.run(scenario())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower == (201, b'{"id_pesanan": 1}', True)
+    assert retry == (201, b'{"id_pesanan": 1}', True)
+    assert len(calls) == 1
+
+def test_cancelled_leader_does_not_cancel_singleflight_followers():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def scenario():
+        load = slow_write(calls)
+        leader = asyncio.create_task(flight.do("kantin", load))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(flight.do("kantin", load))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(scenario())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower == (201, b'{"id_pesanan": 1}')
+    assert len(calls) == 1
@@ -0,0 +1,18 @@
+from menu_import import validate_rows
+
+def test_rows_that_do_not_fit_the_menu_columns_are_reported():
+    items, errors = validate_rows([
+        {"nama_menu": "Nasi", "harga": "15000.500"},
+        {"nama_menu": "Teh", "harga": "1.555"},
+        {"nama_menu": "Mahal", "harga": "100000000"},
+        {"nama_menu": "x" * 256, "harga": "1000"},
+        {"nama_menu": "Es", "harga": "1000", "img_menu": "https://example.com/" + "y" * 500},
+        {"nama_menu": "Kopi", "harga": "99999999.99"},
+    ])
+    assert sorted(items) == [1, 6]
+    assert errors == [
+        {"baris": 2, "errors": ["harga: at most 2 decimal places"]},
+        {"baris": 3, "errors": ["harga: at most 8 digits before the decimal point"]},
+        {"baris": 4, "errors": ["nama_menu: at most 255 characters"]},
+        {"baris": 5, "errors": ["img_menu: at most 500 characters"]},
+    ]
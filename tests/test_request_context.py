@@ -0,0 +1,43 @@
+import tempfile
+from fastapi import APIRouter, FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+from request_context import route_path
+
+def routed_app(labels):
+    """App with a plain route, a route of a prefixed router and a static mount, recording each request's label"""
+    app = FastAPI()
+    router = APIRouter()
+
+    @router.get("/{menu_id}")
+    async def get_menu(menu_id: int):
+        return {}
+
+    @app.get("/health/ready")
+    async def ready():
+        return {}
+
+    app.include_router(router, prefix="/api/v1/menu")
+    directory = tempfile.mkdtemp()
+    with open(f"{directory}/a.jpg", "wb") as f:
+        f.write(b"jpg")
+    app.mount("/uploads", StaticFiles(directory=directory), name="uploads")
+
+    class RecordRoute:
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            await self.app(scope, receive, send)
+            if scope["type"] == "http":
+                labels.append(route_path(scope))
+
+    app.add_middleware(RecordRoute)
+    return app
+
+def test_route_path_labels_by_template():
+    labels = []
+    client = TestClient(routed_app(labels))
+    for path in ("/health/ready", "/api/v1/menu/7", "/uploads/a.jpg"):
+        assert client.get(path).status_code == 200
+    assert labels == ["/health/ready", "/api/v1/menu/{menu_id}", "/uploads/{path}"]
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+import auth
+from accounts import sync_revocations
+from database import SessionLocal
+from models import AkunDihapus
+
+API = "/api/v1"
+
+def register_and_login(client, email="m@example.com", password="rahasia123"):
+    response = client.post(f"{API}/mahasiswa/", json={"nama": "M", "email": email, "password": password, "nim": "1"})
+    assert response.status_code == 201, response.text
+    response = client.post(f"{API}/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return body["user_info"]["id"], {"Authorization": f"Bearer {body['access_token']}"}
+
+def as_another_worker():
+    """Forget this process's revocations, as a worker that did not handle the change would"""
+    auth._revoked_versions.clear()
+
+def test_password_change_revokes_tokens_in_other_workers(client):
+    _, headers = register_and_login(client)
+    response = client.post(f"{API}/auth/change-password", json={"current_password": "rahasia123", "new_password": "rahasia456"}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    as_another_worker()
+    assert client.get(f"{API}/auth/me", headers=headers).status_code == 200
+    sync_revocations()
+    assert client.get(f"{API}/auth/me", headers=headers).status_code == 401
+
+def test_account_deletion_revokes_tokens_in_other_workers(client):
+    user_id, headers = register_and_login(client)
+    assert client.delete(f"{API}/mahasiswa/{user_id}", headers=headers).status_code == 204
+    # Claims-only routes do not load the user, so only the revocation stops the token there
+    assert client.get(f"{API}/kantin/", headers=headers).status_code == 401
+
+    as_another_worker()
+    assert client.get(f"{API}/kantin/", headers=headers).status_code == 200
+    sync_revocations()
+    assert client.get(f"{API}/kantin/", headers=headers).status_code == 401
+
+def test_deletions_older_than_the_token_lifetime_are_purged(client):
+    user_id, headers = register_and_login(client)
+    assert client.delete(f"{API}/mahasiswa/{user_id}", headers=headers).status_code == 204
+    db = SessionLocal()
+    try:
+        db.query(AkunDihapus).update({AkunDihapus.dihapus: datetime.utcnow() - timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES + 1)})
+        db.commit()
+        sync_revocations()
+        assert db.query(AkunDihapus).count() == 0
+    finally:
+        db.close()